@@ -1,66 +1,175 @@
+import base64
+import io
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import io
-from db import get_all_leads, insert_lead, update_lead_status, delete_lead
-from PIL import Image
+from db import (
+    CONVERTED_STATUS, JOBS_IN_APP, get_lead_analytics, get_lead_facets, insert_lead, invalidate_lead_cache,
+    lead_cache, query_leads, save_lead_edits, search_leads
+)
+import jobs
+import metrics
+from export import EXPORT_FORMATS, upload_template
+from ingest import ingest_upload
+from validation import LEAD_SOURCES, LEAD_STATUSES, LICENCE_OPTIONS, validate_lead
 
 # --- Page Config ---
 st.set_page_config(page_title="Lead Tracker", layout="wide")
 
 # --- Load Logo ---
-logo_path = "logo2.png"
-logo = Image.open(logo_path)
+# Shown at 120px; twice that keeps them sharp on high-DPI screens
+LOGO_PX = 240
+
+
+@st.cache_resource(show_spinner=False)
+def load_logo(path, size=LOGO_PX):
+    """A logo downscaled to ``size`` px and encoded as PNG, once per process."""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.thumbnail((size, size))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
 
 # --- CSS for background & positioning ---
-st.markdown("""
+st.markdown(f"""
     <style>
-        .stApp {
+        .stApp {{
             background-color: #40D0E0;
-        }
-        .logo {
+        }}
+        .logo {{
             position: fixed;
             top: 10px;
             right: 50px;
             width: 120px;
             z-index: 100;
-        }
+        }}
     </style>
-    <img src="file://logo1.png" class="logo">
+    <img src="data:image/png;base64,{base64.b64encode(load_logo("logo1.png")).decode()}" class="logo">
 """, unsafe_allow_html=True)
 
 # --- Display logo ---
-st.image(logo, width=120, use_container_width=False, output_format="PNG")
+st.image(load_logo("logo2.png"), width=120, output_format="PNG")
 
 st.title("📕 Lead Tracker")
 
-tab1, tab2, tab3, tab4 = st.tabs([
+
+# --- Background jobs (see jobs.py) ---
+@st.cache_resource(show_spinner=False)
+def job_runner():
+    """Worker threads for this server process, started once; None with JOBS_IN_APP off."""
+    return jobs.JobRunner().start() if JOBS_IN_APP else None
+
+
+job_runner()
+
+
+def job_progress(job):
+    if job["status"] == jobs.QUEUED:
+        st.progress(0.0, text="Waiting for a worker...")
+    elif job["total"]:
+        st.progress(min(job["done"] / job["total"], 1.0), text=f"{job['done']:,} of {job['total']:,} rows")
+    else:
+        st.progress(0.0, text=f"{job['done']:,} rows")
+    if st.button("Cancel", key=f"cancel_job_{job['id']}", disabled=job["cancel_requested"]):
+        jobs.cancel_job(job["id"])
+
+
+# Only this block reruns while a job runs; the whole page once it ends
+@st.fragment(run_every=2)
+def poll_job(job_id):
+    job = jobs.get_job(job_id)
+    if job["status"] not in jobs.ACTIVE:
+        if job["kind"] in jobs.WRITING_KINDS:
+            # a `python jobs.py` worker's writes don't reach this process's cache version
+            invalidate_lead_cache()
+        st.rerun()
+    job_progress(job)
+
+
+def show_job(job_id):
+    """Progress of a queued/running job (polled), or the finished job for the caller to show."""
+    job = jobs.get_job(job_id)
+    if job["status"] in jobs.ACTIVE:
+        poll_job(job_id)
+        return None
+    if job["status"] == jobs.FAILED:
+        st.error(f"Job failed: {job['error']}")
+    elif job["status"] == jobs.CANCELLED:
+        st.warning("Cancelled.")
+    return job
+
+
+# --- Pagination helpers ---
+def fetch_page(pager_key, filters, page_size):
+    """Fetch the current page for a tab, remembering page number and keyset cursors."""
+    state = st.session_state.setdefault(pager_key, {"filters": None, "page": 1, "cursors": {}})
+    if state["filters"] != filters:
+        # filters changed: start again from the first page
+        state.update(filters=filters, page=1, cursors={})
+    page = state["page"]
+    result = query_leads(filters, page=page, page_size=page_size, after_id=state["cursors"].get(page))
+    if result["rows"].empty and page > 1:
+        # rows were deleted under us: fall back to the first page
+        state.update(page=1, cursors={})
+        result = query_leads(filters, page=1, page_size=page_size)
+    state["cursors"][state["page"] + 1] = result["next_after_id"]
+    return result
+
+
+def facet_label(counts):
+    """Selectbox label showing how many leads each option matches."""
+    return lambda value: value if value == "All" else f"{value} ({counts.get(value, 0):,})"
+
+
+def render_pager(pager_key, result):
+    state = st.session_state[pager_key]
+    pages = max(1, -(-result["total"] // result["page_size"]))
+    col_prev, col_info, col_next = st.columns([1, 4, 1])
+    with col_prev:
+        if st.button("◀ Prev", key=f"{pager_key}_prev", disabled=state["page"] <= 1):
+            state["page"] -= 1
+            st.rerun()
+    with col_info:
+        st.caption(f"Page {state['page']} of {pages} · {result['total']} leads")
+    with col_next:
+        if st.button("Next ▶", key=f"{pager_key}_next", disabled=state["page"] >= pages):
+            state["page"] += 1
+            st.rerun()
+
+
+# Tabs track which one is open (switching reruns the script), so the
+# Dashboard's queries and charts only run while it is visible
+tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "📊 All Leads",
     "➕ Add Lead",
     "📋 Manage Leads",
-    "📂 Bulk Upload"
-])
+    "📂 Bulk Upload",
+    "📈 Dashboard"
+], key="main_tabs", on_change="rerun")
 
 # --- Tab 1: All Leads ---
-with tab1:
+with tab1, metrics.timed("render.all_leads"):
     st.subheader("All Leads")
 
-    df_all = get_all_leads()
-    if "first_contacted" in df_all.columns:
-        df_all["first_contacted"] = pd.to_datetime(df_all["first_contacted"], errors="coerce")
-    if "scheduled_walk_in" in df_all.columns:
-        df_all["scheduled_walk_in"] = pd.to_datetime(df_all["scheduled_walk_in"], errors="coerce")
+    facets = get_lead_facets()
 
     # Filters
     col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 1])
     with col1:
         selected_status = st.selectbox(
-            "Status", ["All"] + df_all["status"].dropna().unique().tolist(),
-            index=0, key="filter_status"
+            "Status", ["All"] + facets["statuses"],
+            index=0, key="filter_status",
+            format_func=facet_label(facets["status_counts"])
         )
     with col2:
         selected_source = st.selectbox(
-            "Source", ["All"] + df_all["source"].dropna().unique().tolist(),
-            index=0, key="filter_source"
+            "Source", ["All"] + facets["sources"],
+            index=0, key="filter_source",
+            format_func=facet_label(facets["source_counts"])
         )
     with col3:
         selected_first_contacted = st.date_input(
@@ -74,52 +183,84 @@ with tab1:
         selected_walkin = st.date_input(
             "Scheduled Walk-in", value=None, key="filter_walkin"
         )
-
-    # Apply filters
-    df_filtered = df_all.copy()
-    if selected_status != "All":
-        df_filtered = df_filtered[df_filtered["status"] == selected_status]
-    if selected_source != "All":
-        df_filtered = df_filtered[df_filtered["source"] == selected_source]
-    if selected_first_contacted:
-        df_filtered = df_filtered[df_filtered["first_contacted"].dt.date == selected_first_contacted]
-    if selected_license != "All":
-        df_filtered = df_filtered[df_filtered["licence"] == selected_license]
-    if selected_walkin:
-        df_filtered = df_filtered[df_filtered["scheduled_walk_in"].dt.date == selected_walkin]
+    # Closed leads moved out by archive.py are only read when asked for
+    include_archived = st.checkbox("Include archived leads", key="filter_archived")
+
+    # Apply filters (in SQL, one page at a time)
+    filters = {
+        "status": selected_status,
+        "source": selected_source,
+        "first_contacted": selected_first_contacted,
+        "licence": selected_license,
+        "scheduled_walk_in": selected_walkin,
+        "archived": "include" if include_archived else None,
+    }
+    result = fetch_page("all_leads_pager", filters, page_size=50)
+    df_page = result["rows"]
 
     # Display table
-    if not df_filtered.empty:
-        st.dataframe(df_filtered, use_container_width=True)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df_filtered.to_excel(writer, index=False, sheet_name='Leads')
-        st.download_button(
-            label="📥 Download Excel",
-            data=output.getvalue(),
-            file_name="leads.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    if not df_page.empty:
+        st.dataframe(
+            df_page,
+            use_container_width=True,
+            column_config={
+                "first_contacted": st.column_config.DateColumn("first_contacted"),
+                "scheduled_walk_in": st.column_config.DateColumn("scheduled_walk_in"),
+            },
         )
+        render_pager("all_leads_pager", result)
+        # Built by a background job on request; the file is offered until the
+        # filters, the format or the data (lead_cache.version) change
+        exp_col1, exp_col2 = st.columns([1, 3])
+        with exp_col1:
+            export_fmt = st.selectbox(
+                "Export format", list(EXPORT_FORMATS),
+                format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+            )
+        export_request = (lead_cache.version, export_fmt, repr(filters))
+        if st.button("Prepare export", key="prepare_export"):
+            st.session_state["export_job"] = (
+                export_request, jobs.submit("export", filters=filters, fmt=export_fmt)
+            )
+        export_job = st.session_state.get("export_job")
+        if export_job and export_job[0] == export_request:
+            job = show_job(export_job[1])
+            if job and job["status"] == jobs.SUCCEEDED:
+                label, extension, mime = EXPORT_FORMATS[export_fmt]
+                path = Path(job["result"]["path"])
+                if path.exists():
+                    st.download_button(
+                        label=f"📥 Download {label}",
+                        data=path.read_bytes,  # read on click, not on every render
+                        file_name=job["result"]["file_name"],
+                        mime=mime
+                    )
+                else:
+                    st.info("This export has been cleared from the server; prepare it again.")
     else:
         st.info("No leads match the filters.")
 
 # --- Tab 2: Add Lead ---
-with tab2:
+with tab2, metrics.timed("render.add_lead"):
     st.subheader("Add New Lead")
 
     # Inputs with session state
     name = st.text_input("Name", key="add_name")
     contact = st.text_input("Contact Number", key="add_contact")
     address = st.text_area("Address", key="add_address")
-    source = st.selectbox("Source", ["Instagram", "Referral", "Walk-in", "Other"], key="add_source")
-    status = st.selectbox("Status", ["pending", "processing", "onboarded", "rejected"], key="add_status")
-    licence = st.selectbox("Licence", ["unknown", "yes", "no"], index=0, key="add_licence")
+    source = st.selectbox("Source", LEAD_SOURCES, key="add_source")
+    status = st.selectbox("Status", LEAD_STATUSES, key="add_status")
+    licence = st.selectbox("Licence", LICENCE_OPTIONS, index=0, key="add_licence")
     first_contacted = st.date_input("First Contacted", value=None, key="add_first_contacted")
     scheduled_walk_in = st.date_input("Scheduled Walk-in", value=None, key="add_scheduled_walkin")
     notes = st.text_area("Notes", key="add_notes")
 
     if st.button("Save Lead", key="save_lead"):
-        if name and contact:
+        form_errors = validate_lead({
+            "name": name, "contact_number": contact, "source": source, "status": status,
+            "licence": licence, "first_contacted": first_contacted, "scheduled_walk_in": scheduled_walk_in,
+        })
+        if not form_errors:
             success = insert_lead(
                 name=name,
                 contact=contact,
@@ -145,10 +286,10 @@ with tab2:
             # Force page refresh
             st.rerun()
         else:
-            st.warning("⚠️ Name & Contact are required.")
+            st.warning("⚠️ " + ", ".join(form_errors))
 
 # --- Tab 3: Manage Leads ---
-with tab3:
+with tab3, metrics.timed("render.manage_leads"):
     st.markdown("""
         <style>
         div[data-testid="stVerticalBlock"] > div:nth-of-type(4) {
@@ -160,13 +301,7 @@ with tab3:
     """, unsafe_allow_html=True)
 
     st.subheader("Manage Leads")
-    df = get_all_leads()
-
-    # Parse datetime columns
-    if "first_contacted" in df.columns:
-        df["first_contacted"] = pd.to_datetime(df["first_contacted"], errors="coerce")
-    if "scheduled_walk_in" in df.columns:
-        df["scheduled_walk_in"] = pd.to_datetime(df["scheduled_walk_in"], errors="coerce")
+    facets = get_lead_facets()
 
     # --- Filters ---
     st.markdown("### Filters")
@@ -174,23 +309,25 @@ with tab3:
 
     with col1:
         selected_status = st.selectbox(
-            "Status", ["All"] + df["status"].dropna().unique().tolist(),
-            index=0, key="manage_status"
+            "Status", ["All"] + facets["statuses"],
+            index=0, key="manage_status",
+            format_func=facet_label(facets["status_counts"])
         )
 
     with col2:
         selected_source = st.selectbox(
-            "Source", ["All"] + df["source"].dropna().unique().tolist(),
-            index=0, key="manage_source"
+            "Source", ["All"] + facets["sources"],
+            index=0, key="manage_source",
+            format_func=facet_label(facets["source_counts"])
         )
 
     with col3:
         search_term = st.text_input("Search", key="manage_search")
 
     with col4:
-        if not df["first_contacted"].dropna().empty:
-            min_date = df["first_contacted"].dropna().min().date()
-            max_date = df["first_contacted"].dropna().max().date()
+        if pd.notnull(facets["first_contacted_min"]):
+            min_date = facets["first_contacted_min"].date()
+            max_date = facets["first_contacted_max"].date()
             date_filter = st.date_input(
                 "Date Between",
                 value=[],  # <-- keep it blank by default
@@ -201,183 +338,242 @@ with tab3:
         else:
             date_filter = []
 
-    # --- Apply Filters ---
-    df_filtered = df.copy()
-    if selected_status != "All":
-        df_filtered = df_filtered[df_filtered["status"] == selected_status]
-    if selected_source != "All":
-        df_filtered = df_filtered[df_filtered["source"] == selected_source]
-    if search_term:
-        df_filtered = df_filtered[
-            df_filtered["name"].str.contains(search_term, case=False, na=False) |
-            df_filtered["contact_number"].astype(str).str.contains(search_term, case=False, na=False)
-        ]
-    if date_filter and len(date_filter) == 2:
-        start_date, end_date = date_filter
-        df_filtered = df_filtered[
-            (df_filtered["first_contacted"] >= pd.to_datetime(start_date)) &
-            (df_filtered["first_contacted"] <= pd.to_datetime(end_date))
-            ]
-
-    # --- Editable Rows ---
-    if not df_filtered.empty:
-        for _, row in df_filtered.iterrows():
-            cols = st.columns([1.3, 1.3, 1.2, 1.2, 1.5, 1.2, 1.5, 2, 0.8, 0.8])
-
-            with cols[0]:
-                new_name = st.text_input(f"Name ({row['id']})", value=row["name"], key=f"name_{row['id']}")
-
-            with cols[1]:
-                new_contact = st.text_input(f"Contact ({row['id']})", value=row["contact_number"], key=f"contact_{row['id']}")
-
-            with cols[2]:
-                new_source = st.selectbox(
-                    f"Source ({row['id']})",
-                    ["Instagram", "Referral", "Walk-in", "Other"],
-                    index=["Instagram", "Referral", "Walk-in", "Other"].index(row["source"]) if row["source"] in ["Instagram", "Referral", "Walk-in", "Other"] else 0,
-                    key=f"source_{row['id']}"
-                )
-
-            with cols[3]:
-                new_status = st.selectbox(
-                    f"Status ({row['id']})",
-                    ["pending", "processing", "onboarded", "rejected"],
-                    index=["pending", "processing", "onboarded", "rejected"].index(row["status"]) if row["status"] in ["pending", "processing", "onboarded", "rejected"] else 0,
-                    key=f"status_{row['id']}"
-                )
-
-            with cols[4]:
-                new_first_contacted = st.date_input(
-                    f"First Contacted ({row['id']})",
-                    value=row["first_contacted"].date() if pd.notnull(row["first_contacted"]) else pd.to_datetime("today").date(),
-                    key=f"first_contacted_{row['id']}"
-                )
+    # --- Apply Filters (in SQL, one page at a time) ---
+    filters = {
+        "status": selected_status,
+        "source": selected_source,
+        "first_contacted_between": tuple(date_filter) if date_filter and len(date_filter) == 2 else None,
+    }
+    if search_term.strip():
+        # ranked server-side search replaces paging while a term is entered
+        result = None
+        df_filtered = search_leads(search_term, filters=filters, limit=100)
+        if not df_filtered.empty:
+            st.caption(f"Top {len(df_filtered)} matches for \"{search_term.strip()}\"")
+            df_filtered = df_filtered.drop(columns="rank")
+    else:
+        result = fetch_page("manage_leads_pager", filters, page_size=100)
+        df_filtered = result["rows"]
 
-            with cols[5]:
-                new_licence = st.selectbox(
-                    f"Licence ({row['id']})",
-                    ["yes", "no"],
-                    index=["yes", "no"].index(row["licence"]) if row["licence"] in ["yes", "no"] else 1,
-                    key=f"licence_{row['id']}"
-                )
+    # --- Editable Grid ---
+    # One data_editor per page; edits are collected as a diff and saved in
+    # a single batch instead of one widget set and button per lead.
+    if not df_filtered.empty:
+        editable_columns = [
+            "name", "contact_number", "source", "status", "first_contacted",
+            "licence", "scheduled_walk_in", "notes"
+        ]
+        df_editor = df_filtered[["id"] + editable_columns].reset_index(drop=True)
+        df_editor["delete"] = False
+
+        # new key per page and after each save, so stale edits are never replayed
+        generation = st.session_state.setdefault("manage_editor_generation", 0)
+        editor_key = f"manage_editor_{generation}_{hash(tuple(df_editor['id']))}"
+        df_edited = st.data_editor(
+            df_editor,
+            key=editor_key,
+            hide_index=True,
+            use_container_width=True,
+            disabled=["id"],
+            column_config={
+                "id": st.column_config.NumberColumn("ID"),
+                "name": st.column_config.TextColumn("Name", required=True),
+                "contact_number": st.column_config.TextColumn("Contact", required=True),
+                "source": st.column_config.SelectboxColumn("Source", options=LEAD_SOURCES, required=True),
+                "status": st.column_config.SelectboxColumn("Status", options=LEAD_STATUSES, required=True),
+                "first_contacted": st.column_config.DateColumn("First Contacted"),
+                "licence": st.column_config.SelectboxColumn("Licence", options=LICENCE_OPTIONS),
+                "scheduled_walk_in": st.column_config.DateColumn("Scheduled Walk-in"),
+                "notes": st.column_config.TextColumn("Notes"),
+                "delete": st.column_config.CheckboxColumn("🗑️"),
+            },
+        )
 
-            with cols[6]:
-                has_walkin = st.checkbox(
-                    f"Has Scheduled Walk-in? ({row['id']})",
-                    value=pd.notnull(row["scheduled_walk_in"]),
-                    key=f"walkin_chk_{row['id']}"
-                )
+        # Rows where any editable value differs (NaN/NaT on both sides is no change)
+        before, after = df_editor[editable_columns], df_edited[editable_columns]
+        changed = ~((before == after) | (before.isna() & after.isna())).all(axis=1)
+        to_delete = df_edited["delete"]
+        changes = df_edited[changed & ~to_delete].to_dict("records")
+        delete_ids = df_edited.loc[to_delete, "id"].tolist()
+
+        if changes or delete_ids:
+            st.caption(f"{len(changes)} edited, {len(delete_ids)} marked for deletion")
+        if st.button("💾 Save Changes", key="save_manage_changes", disabled=not (changes or delete_ids)):
+            # one transaction: a clashing contact number saves nothing
+            if save_lead_edits(changes, delete_ids):
+                st.session_state["manage_editor_generation"] += 1
+                st.success(f"Saved {len(changes)} edits and {len(delete_ids)} deletions.")
+                st.rerun()
 
-                if has_walkin:
-                    new_walk_in = st.date_input(
-                        f"Scheduled Walk-in ({row['id']})",
-                        value=row["scheduled_walk_in"].date() if pd.notnull(
-                            row["scheduled_walk_in"]) else pd.to_datetime("today").date(),
-                        key=f"walkin_{row['id']}"
+        if result is not None:
+            render_pager("manage_leads_pager", result)
+
+        # Every lead matching the filters, not just this page: run as a background job
+        if result is not None:
+            with st.expander(f"Set status for all {result['total']} matching leads"):
+                bulk_status = st.selectbox("New status", LEAD_STATUSES, key="bulk_status")
+                bulk_notes = st.text_input("Note to append", key="bulk_status_notes")
+                if st.button("Apply to all", key="bulk_status_apply"):
+                    st.session_state["status_job"] = jobs.submit(
+                        "status_change", filters=filters, status=bulk_status, notes=bulk_notes
                     )
-                else:
-                    new_walk_in = None
-
-            with cols[7]:
-                new_notes = st.text_input(f"Notes ({row['id']})", value=row.get("notes", ""), key=f"notes_{row['id']}")
-
-            with cols[8]:
-                if st.button("✅", key=f"update_{row['id']}"):
-                    update_lead_status(
-                        lead_id=row['id'],
-                        name=new_name,
-                        contact_number=new_contact,
-                        source=new_source,
-                        status=new_status,
-                        first_contacted=pd.to_datetime(new_first_contacted),
-                        notes=new_notes,
-                        licence=new_licence,
-                        scheduled_walk_in=pd.to_datetime(new_walk_in)
-                    )
-                    st.success(f"Lead {new_name} updated!")
-                    st.rerun()
-
-            with cols[9]:
-                if st.button("🗑️", key=f"del_{row['id']}"):
-                    delete_lead(row['id'])
-                    st.success(f"Lead {row['name']} deleted!")
-                    st.rerun()
+                if "status_job" in st.session_state:
+                    job = show_job(st.session_state["status_job"])
+                    if job and job["status"] == jobs.SUCCEEDED:
+                        st.success(f"{job['result']['changed']} of {job['result']['matched']} leads changed status.")
     else:
         st.info("No leads match your filters.")
 
 # --- Tab 4: Bulk Upload ---
-with tab4:
+with tab4, metrics.timed("render.bulk_upload"):
     st.markdown("### 📂 Bulk Upload Leads")
 
     # Download template
-    template_df = pd.DataFrame(columns=[
-        "name", "contact_number", "address", "source", "status",
-        "first_contacted", "licence", "scheduled_walk_in", "notes"
-    ])
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        template_df.to_excel(writer, index=False, sheet_name='Leads_Template')
     st.download_button(
         label="Download Excel Template",
-        data=output.getvalue(),
+        data=upload_template,  # built on the first click, not on every render
         file_name="lead_upload_template.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
     uploaded_file = st.file_uploader("Upload CSV or Excel file", type=["csv", "xlsx"])
     if uploaded_file:
-        try:
-            if uploaded_file.name.endswith(".csv"):
-                df_upload = pd.read_csv(uploaded_file)
-            else:
-                df_upload = pd.read_excel(uploaded_file)
-        except Exception as e:
-            st.error(f"Error reading file: {e}")
-            st.stop()
-
-        # Validation
-        valid_status = ["pending", "processing", "onboarded", "rejected"]
-        valid_source = ["Instagram", "Referral", "Walk-in", "Other"]
-        valid_licence = ["unknown", "yes", "no"]
-
-        df_upload["is_valid"] = True
-        df_upload["errors"] = ""
-
-        for idx, row in df_upload.iterrows():
-            errors = []
-            if pd.isna(row.get("name")) or pd.isna(row.get("contact_number")):
-                errors.append("Missing name/contact")
-            if row.get("status") not in valid_status:
-                errors.append("Invalid status")
-            if row.get("source") not in valid_source:
-                errors.append("Invalid source")
-            if row.get("licence") not in valid_licence:
-                errors.append("Invalid licence (must be Unknown/yes/no)")
-
-            if errors:
-                df_upload.at[idx, "is_valid"] = False
-                df_upload.at[idx, "errors"] = ", ".join(errors)
+        # Validate each uploaded file once, streaming it chunk by chunk;
+        # reruns reuse the stored summary instead of re-reading the file
+        file_id = getattr(uploaded_file, "file_id", uploaded_file.name)
+        summary = st.session_state.get("upload_summary")
+        if summary is None or summary["file_id"] != file_id:
+            progress = st.progress(0.0, text="Validating upload...")
+            try:
+                summary = ingest_upload(
+                    uploaded_file,
+                    on_progress=lambda fraction, s: progress.progress(
+                        fraction or 0.0, text=f"Validated {s['rows']} rows"
+                    ),
+                )
+            except Exception as e:
+                st.error(f"Error reading file: {e}")
+                st.stop()
+            progress.empty()
+            summary["file_id"] = file_id
+            st.session_state["upload_summary"] = summary
 
         st.markdown("#### Preview Uploaded Leads")
-        st.dataframe(df_upload)
-
-        if st.button("✅ Insert Valid Leads", key="insert_bulk_leads"):
-            valid_rows = df_upload[df_upload["is_valid"]]
-            invalid_rows = df_upload[~df_upload["is_valid"]]
-
-            for _, row in valid_rows.iterrows():
-                insert_lead(
-                    name=row.get("name"),
-                    contact=row.get("contact_number"),
-                    address=row.get("address", ""),
-                    source=row.get("source", ""),
-                    status=row.get("status", "pending"),
-                    first_contacted=pd.to_datetime(row.get("first_contacted"), errors="coerce") if row.get("first_contacted") else None,
-                    notes=row.get("notes", ""),
-                    licence=row.get("licence", "No"),
-                    scheduled_walk_in=pd.to_datetime(row.get("scheduled_walk_in"), errors="coerce") if row.get("scheduled_walk_in") else None
+        st.caption(
+            f"{summary['rows']} rows · {summary['valid']} valid · {summary['invalid']} invalid · "
+            f"{summary['new']} new · {summary['in_file_duplicates']} duplicated in the file · "
+            f"{summary['db_duplicates']} already in the database "
+            f"(showing the first {len(summary['preview'])})"
+        )
+        st.dataframe(summary["preview"])
+        if not summary["invalid_preview"].empty:
+            st.markdown("#### Rows Failing Validation")
+            st.dataframe(summary["invalid_preview"])
+        if not summary["duplicate_preview"].empty:
+            st.markdown("#### Duplicate Contact Numbers")
+            st.caption("Matched on the last 10 digits, ignoring spaces, dashes and country code. These are skipped.")
+            st.dataframe(summary["duplicate_preview"])
+
+        # Inserted by a background job: it carries on if this tab is closed
+        if st.button("✅ Insert New Leads", key="insert_bulk_leads"):
+            st.session_state["upload_job"] = (file_id, jobs.submit_upload(uploaded_file))
+        upload_job = st.session_state.get("upload_job")
+        if upload_job and upload_job[0] == file_id:
+            job = show_job(upload_job[1])
+            if job and job["status"] == jobs.SUCCEEDED:
+                result = job["result"]
+                st.success(f"{result['inserted']} leads inserted successfully!")
+                if result["duplicates"]:
+                    st.warning(
+                        f"{result['duplicates']} rows skipped: contact number repeated in the file or already exists."
+                    )
+                if result["failed"]:
+                    st.error(f"{result['failed']} rows could not be inserted.")
+                    st.dataframe(pd.DataFrame(result["failed_preview"]))
+                if result["invalid"]:
+                    st.warning(f"{result['invalid']} rows failed validation. Check 'errors' column above.")
+
+# --- Tab 5: Dashboard ---
+with tab5, metrics.timed("render.dashboard"):
+    if tab5.open is not False:
+        st.subheader("Lead Funnel")
+        weeks = st.selectbox("Weeks shown", [4, 12, 26, 52], index=1, key="dashboard_weeks")
+        analytics = get_lead_analytics(weeks)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Leads", analytics["total"])
+        col2.metric(CONVERTED_STATUS.capitalize(), analytics["converted"])
+        col3.metric(
+            "Conversion Rate",
+            f"{analytics['converted'] / analytics['total']:.1%}" if analytics["total"] else "–"
+        )
+
+        if analytics["total"]:
+            col_status, col_source = st.columns(2)
+            with col_status:
+                st.markdown("#### Leads per Status")
+                by_status = analytics["by_status"].set_index("status")["leads"]
+                order = [s for s in LEAD_STATUSES if s in by_status.index]
+                st.bar_chart(by_status.reindex(order + [s for s in by_status.index if s not in order]))
+            with col_source:
+                st.markdown("#### Conversion by Source")
+                st.dataframe(
+                    analytics["by_source"],
+                    hide_index=True,
+                    column_config={
+                        "conversion_rate": st.column_config.ProgressColumn(
+                            "Conversion", format="percent", min_value=0.0, max_value=1.0
+                        ),
+                    },
                 )
 
-            st.success(f"{len(valid_rows)} leads inserted successfully!")
-            if not invalid_rows.empty:
-                st.warning(f"{len(invalid_rows)} rows failed validation. Check 'errors' column above.")
\ No newline at end of file
+            st.markdown(f"#### New Leads per Week (last {weeks} weeks)")
+            weekly = analytics["weekly"]
+            if weekly.empty:
+                st.info("No leads created in this period.")
+            else:
+                st.bar_chart(weekly.pivot_table(index="week", columns="status", values="leads", fill_value=0))
+
+            st.markdown("#### Time Between Stages")
+            stages = analytics["stages"]
+            if stages.empty:
+                st.info("No status changes recorded yet.")
+            else:
+                st.dataframe(
+                    stages,
+                    hide_index=True,
+                    column_config={
+                        "old_status": "From",
+                        "new_status": "To",
+                        "transitions": "Changes",
+                        "avg_days": st.column_config.NumberColumn("Avg. days in stage", format="%.1f"),
+                    },
+                )
+        else:
+            st.info("No leads yet.")
+
+# --- Debug sidebar (METRICS_ENABLED) ---
+# Rendered last so it includes this run's tab render times
+if metrics.enabled():
+    with st.sidebar:
+        st.markdown("### 🐞 Debug metrics")
+        st.caption("Totals since the server started; render.* are whole-tab timings.")
+        st.dataframe(
+            metrics.ops_frame(),
+            hide_index=True,
+            column_config={
+                "total_ms": st.column_config.NumberColumn("total ms", format="%.1f"),
+                "avg_ms": st.column_config.NumberColumn("avg ms", format="%.1f"),
+                "max_ms": st.column_config.NumberColumn("max ms", format="%.1f"),
+            },
+        )
+        snap = metrics.snapshot()
+        if snap["caches"]:
+            st.markdown("#### Query caches")
+            st.dataframe(pd.DataFrame.from_dict(snap["caches"], orient="index"))
+        for name, stats in snap["sources"].items():
+            st.markdown(f"#### {name}")
+            st.json(stats, expanded=False)
+        if st.button("Reset metrics", key="reset_metrics"):
+            metrics.reset()
+            st.rerun()
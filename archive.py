@@ -0,0 +1,67 @@
+"""Archive closed leads and keep lead_history's monthly partitions ahead.
+
+    python archive.py                          # archive leads closed > ARCHIVE_AFTER_DAYS ago
+    python archive.py --older-than-days 90     # a different age for this run
+    python archive.py --max-batches 10         # stop after 10 batches; the next run carries on
+    python archive.py --status                 # live / archived / due counts and history partitions
+
+Leads in a closed status (db.CLOSED_STATUSES) whose updated_at is older
+than the cutoff move to leads_archive in batches of --batch-size, each its
+own transaction, so the command can run from cron next to the app and be
+stopped at any point: whatever is left is picked up by the next run. Lead
+queries leave archived leads out unless their filters set "archived".
+
+On PostgreSQL each run also creates the lead_history partitions for the
+coming months (migration 6 partitions it by month of changed_at); old
+months can then be detached or dropped as whole tables.
+"""
+import argparse
+import sys
+import time
+
+import db
+
+
+def run(older_than_days, batch_rows, max_batches=None, pause=0.0):
+    """Archive due leads batch by batch; returns the number archived."""
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        started = time.perf_counter()
+        ids = db.archive_closed_leads(older_than_days, batch_rows)
+        batches += 1
+        archived += len(ids)
+        print(f"batch {batches}: archived {len(ids)} leads in {time.perf_counter() - started:.2f}s")
+        if len(ids) < batch_rows:
+            break
+        time.sleep(pause)
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lead Tracker archive maintenance")
+    parser.add_argument("--older-than-days", type=int, default=db.ARCHIVE_AFTER_DAYS,
+                        help="archive closed leads not updated for this many days")
+    parser.add_argument("--batch-size", type=int, default=db.ARCHIVE_BATCH_ROWS, help="leads per transaction")
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--status", action="store_true", help="show counts and history partitions only")
+    args = parser.parse_args()
+
+    if args.status:
+        stats = db.get_archive_stats(args.older_than_days)
+        print(f"live leads: {stats['live']}  archived: {stats['archived']}  due now: {stats['due']}")
+        for row in db.get_history_partitions().itertuples(index=False):
+            print(f"{row.partition:<28} {row.rows_estimate:>10}  {row.bounds}")
+        return 0
+
+    added = db.add_history_partitions()
+    if added:
+        print(f"Added {added} lead_history partitions.")
+    archived = run(args.older_than_days, args.batch_size, args.max_batches, args.pause)
+    pruned = db.prune_daily_counts()
+    print(f"Archived {archived} leads; pruned {pruned} empty rollup buckets.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
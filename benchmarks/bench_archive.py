@@ -0,0 +1,125 @@
+"""Time the hot-path lead queries before and after archiving closed leads.
+
+    python -m benchmarks.bench_archive [--rows 100000] [--closed-share 0.7] [--repeat 5]
+
+Seeds --rows synthetic leads (with history) of which --closed-share are
+onboarded/rejected and last touched long ago, times the queries every
+rerun of the app makes, archives the closed ones as archive.py does, and times the same queries again, plus the opt-in archive
+read. Uses a throwaway SQLite database unless DATABASE_URL or DB_BACKEND is
+set; against a configured database the synthetic rows are deleted again
+afterwards, archived ones included.
+"""
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import time
+
+# the embedded backend unless a database is configured; db reads this on import
+_SCRATCH_DIR = None
+if not (os.getenv("DATABASE_URL") or os.getenv("DB_BACKEND")):
+    _SCRATCH_DIR = tempfile.mkdtemp(prefix="leadtracker-archive-")
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(_SCRATCH_DIR, "leads.db")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import archive  # noqa: E402
+import db  # noqa: E402
+from benchmarks.suite import _measure  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    BENCH_TAG, copy_history, copy_leads, delete_bench_leads, make_history_frame, make_leads_frame,
+)
+
+
+def _seed(rows, closed_share, seed):
+    rng = np.random.default_rng(seed)
+    leads = make_leads_frame(rows, seed=seed)
+    closed = rng.random(rows) < closed_share
+    leads["status"] = np.where(closed, rng.choice(["onboarded", "rejected"], rows, p=[2 / 3, 1 / 3]),
+                               rng.choice(["pending", "processing"], rows))
+    last_id = pd.read_sql("SELECT COALESCE(MAX(id), 0) AS n FROM leads", db.engine)["n"].iloc[0]
+    copy_leads(leads)
+    new = pd.read_sql(
+        f"SELECT id, status, created_at FROM leads WHERE id > {int(last_id)} ORDER BY id", db.engine
+    )
+    copy_history(make_history_frame(new, seed=seed))
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            # synthetic leads were created in 2024-25; make that their last edit too
+            cur.execute(f"UPDATE leads SET updated_at = created_at WHERE notes LIKE '%{BENCH_TAG}'")
+            cur.execute("ANALYZE")
+
+
+# The cached entry points are timed through __wrapped__ so every run reaches the database
+def _cases():
+    return {
+        "query_leads first page": lambda: db._query_leads.__wrapped__(0, {}, 1, 50, "newest", None),
+        "query_leads status=pending": lambda: db._query_leads.__wrapped__(
+            0, {"status": "pending"}, 1, 50, "newest", None
+        ),
+        "get_lead_facets": lambda: db._get_lead_facets.__wrapped__(0),
+        "get_lead_analytics": lambda: db._get_lead_analytics.__wrapped__(0, 12),
+        "get_all_leads (full load)": db.get_all_leads,
+    }
+
+
+def _time_cases(cases, repeat):
+    results = {}
+    for case, fn in cases.items():
+        fn()  # warm the page cache and connection pool
+        gc.collect()  # the full loads leave garbage that would be collected mid-case
+        results[case] = _measure(fn, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--closed-share", type=float, default=0.7,
+                        help="share of synthetic leads that are onboarded/rejected")
+    parser.add_argument("--older-than-days", type=int, default=db.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=db.ARCHIVE_BATCH_ROWS)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        started = time.perf_counter()
+        _seed(args.rows, args.closed_share, args.seed)
+        print(f"seeded {args.rows} leads in {time.perf_counter() - started:.1f}s")
+
+        before = _time_cases(_cases(), args.repeat)
+        started = time.perf_counter()
+        archived = archive.run(args.older_than_days, args.batch_size)
+        db.prune_daily_counts()
+        elapsed = time.perf_counter() - started
+        print(f"archived {archived} leads in {elapsed:.1f}s ({archived / max(elapsed, 1e-9):,.0f} leads/s)")
+        after = _time_cases(_cases(), args.repeat)
+        opt_in = _time_cases({
+            "query_leads first page, archived=include": lambda: db._query_leads.__wrapped__(
+                0, {"archived": "include"}, 1, 50, "newest", None
+            ),
+            "query_leads first page, archived=only": lambda: db._query_leads.__wrapped__(
+                0, {"archived": "only"}, 1, 50, "newest", None
+            ),
+        }, args.repeat)
+
+        print(f"\n{'case':<42} {'before p50':>11} {'after p50':>10} {'ratio':>7}")
+        for case, stats in before.items():
+            ratio = after[case]["p50_ms"] / stats["p50_ms"] if stats["p50_ms"] else float("nan")
+            print(f"{case:<42} {stats['p50_ms']:>11.2f} {after[case]['p50_ms']:>10.2f} {ratio:>6.2f}x")
+        for case, stats in opt_in.items():
+            print(f"{case:<42} {'':>11} {stats['p50_ms']:>10.2f}")
+    finally:
+        if _SCRATCH_DIR:
+            db.engine.dispose()
+            shutil.rmtree(_SCRATCH_DIR, ignore_errors=True)
+        else:
+            print(f"deleted {delete_bench_leads()} synthetic rows")
+
+
+if __name__ == "__main__":
+    main()
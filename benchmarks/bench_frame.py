@@ -0,0 +1,76 @@
+"""Memory and filter latency of default-typed vs compact (db.compact_leads) lead frames.
+
+    python -m benchmarks.bench_frame [--sizes 100000 1000000] [--repeat 20]
+
+For each size the leads are read as pandas returns them, then typed with
+compact_leads(). Reports the deep memory footprint of each frame and the
+latency of a Tab-style filter: the old pattern (copy, re-parse dates, filter
+object columns) against masks over the compact frame. Seeds and reuses
+synthetic rows like bench_search.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+import db
+from benchmarks.synthetic import copy_leads, count_bench_leads, make_leads_frame
+from validation import LEAD_SOURCES, LEAD_STATUSES
+
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def _old_filter(df, status, source):
+    df = df.copy()
+    df["first_contacted"] = pd.to_datetime(df["first_contacted"], errors="coerce")
+    df["scheduled_walk_in"] = pd.to_datetime(df["scheduled_walk_in"], errors="coerce")
+    df = df[df["status"] == status]
+    return df[df["source"] == source]
+
+
+def _new_filter(df, status, source):
+    return df[(df["status"] == status) & (df["source"] == source)]
+
+
+def _ms(fn, df, repeat, seed):
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(df, rng.choice(LEAD_STATUSES), rng.choice(LEAD_SOURCES))
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20, help="filter runs per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    existing = count_bench_leads()
+    if existing < max(args.sizes):
+        copy_leads(make_leads_frame(max(args.sizes) - existing, seed=args.seed + existing, start=existing))
+
+    print(f"{'rows':>9} {'raw MB':>8} {'compact MB':>11} {'typing ms':>10} "
+          f"{'old filter ms':>14} {'mask filter ms':>15}")
+    for size in args.sizes:
+        # through the backend: it translates the placeholder for SQLite
+        raw = db._backend.read_sql(
+            f"SELECT {db.LEAD_SELECT_COLUMNS} FROM leads ORDER BY id DESC LIMIT %(n)s", {"n": size}
+        )
+        started = time.perf_counter()
+        compact = db.compact_leads(raw.copy())
+        typing_ms = (time.perf_counter() - started) * 1000
+        print(f"{len(raw):>9} {_mb(raw):>8.1f} {_mb(compact):>11.1f} {typing_ms:>10.0f} "
+              f"{_ms(_old_filter, raw, args.repeat, args.seed):>14.1f} "
+              f"{_ms(_new_filter, compact, args.repeat, args.seed):>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure search_leads latency (p50/p95/p99) on a large synthetic dataset.
+
+    python -m benchmarks.bench_search [--rows 1000000] [--queries 300] [--cleanup]
+
+Writes to the configured database: point DATABASE_URL at a scratch
+PostgreSQL migrated with migrations.py. Synthetic rows are tagged (see
+synthetic.BENCH_TAG) and reused between runs; --cleanup deletes them.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import db
+from benchmarks.synthetic import (
+    AREAS, FIRST_NAMES, LAST_NAMES, NOTE_WORDS,
+    copy_leads, count_bench_leads, delete_bench_leads, make_leads_frame, synthetic_contact,
+)
+
+
+def _typo(word, rng):
+    i = rng.randrange(1, len(word))
+    return word[:i] + word[i + 1:]
+
+
+def _terms(rng, rows):
+    """A mix of the searches people actually type, by category."""
+    digits = synthetic_contact(rng.randrange(rows))
+    return {
+        "name": rng.choice(FIRST_NAMES),
+        "full name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "name typo": _typo(rng.choice(LAST_NAMES), rng),
+        "phone +91 prefix": f"+91 {digits[:5]}",
+        "phone full": digits,
+        "phone tail": digits[-6:],
+        "address": rng.choice(AREAS).split()[0],
+        "notes": rng.choice(NOTE_WORDS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=300, help="queries per category")
+    parser.add_argument("--limit", type=int, default=db.SEARCH_LIMIT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cleanup", action="store_true", help="delete the synthetic rows afterwards")
+    args = parser.parse_args()
+
+    existing = count_bench_leads()
+    if existing < args.rows:
+        started = time.perf_counter()
+        df = make_leads_frame(args.rows - existing, seed=args.seed + existing, start=existing)
+        copy_leads(df)
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE leads")
+        print(f"seeded {len(df)} rows in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(args.seed)
+    timings = {}
+    for _ in range(args.queries):
+        for category, term in _terms(rng, args.rows).items():
+            started = time.perf_counter()
+            db._run_search(term, None, args.limit)
+            timings.setdefault(category, []).append((time.perf_counter() - started) * 1000)
+
+    print(f"search_leads over {max(existing, args.rows)} synthetic rows, "
+          f"trigram={'on' if db._has_trigram_search() else 'off'}, limit={args.limit}")
+    print(f"{'category':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    everything = []
+    for category, values in timings.items():
+        everything.extend(values)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{category:<18} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+    p50, p95, p99 = np.percentile(everything, [50, 95, 99])
+    print(f"{'all':<18} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+
+    if args.cleanup:
+        print(f"deleted {delete_bench_leads()} synthetic rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure app.py cold start and per-rerun time with Streamlit's AppTest.
+
+    python -m benchmarks.bench_startup [--starts 5] [--reruns 20] [--leads 1000]
+
+Each cold start is a fresh interpreter running the script once, so module
+imports, settings and engine creation are included; reruns then repeat the
+script in that process, as Streamlit does on every interaction. Uses a
+throwaway SQLite database seeded with --leads synthetic leads (so the
+dashboard has charts to draw) unless DATABASE_URL or DB_BACKEND is set.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# runs in the child interpreter; prints one JSON line of timings
+_CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+cold = time.perf_counter() - started
+assert not at.exception, at.exception
+reruns = []
+for _ in range(int(sys.argv[2])):
+    started = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - started)
+print(json.dumps({"cold": cold, "reruns": reruns}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--starts", type=int, default=5, help="cold starts (fresh interpreters)")
+    parser.add_argument("--reruns", type=int, default=20, help="reruns after each cold start")
+    parser.add_argument("--leads", type=int, default=1000, help="synthetic leads in the scratch database")
+    args = parser.parse_args()
+
+    scratch = None
+    if not (os.getenv("DATABASE_URL") or os.getenv("DB_BACKEND")):
+        scratch = tempfile.TemporaryDirectory(prefix="leadtracker-startup-")
+        os.environ.update(DB_BACKEND="sqlite", SQLITE_PATH=os.path.join(scratch.name, "leads.db"))
+        # db reads the settings above on import
+        from benchmarks.synthetic import copy_leads, make_leads_frame
+
+        copy_leads(make_leads_frame(args.leads))
+    env = dict(os.environ)
+
+    cold, reruns = [], []
+    try:
+        for _ in range(args.starts):
+            out = subprocess.run(
+                [sys.executable, "-c", _CHILD, APP, str(args.reruns)],
+                cwd=os.path.dirname(APP), env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            cold.append(result["cold"] * 1000)
+            reruns.extend(value * 1000 for value in result["reruns"])
+    finally:
+        if scratch:
+            scratch.cleanup()
+
+    print(f"{'phase':<12} {'p50 ms':>8} {'p95 ms':>8} {'runs':>6}")
+    for phase, values in (("cold start", cold), ("rerun", reruns)):
+        p50, p95 = np.percentile(values, [50, 95])
+        print(f"{phase:<12} {p50:>8.1f} {p95:>8.1f} {len(values):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compare the vectorized upload validation with the old per-row loop.
+
+    python -m benchmarks.bench_validation [--sizes 10000 100000 1000000]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_upload_frame
+from validation import LEAD_SOURCES, LEAD_STATUSES, LICENCE_OPTIONS, validate_leads
+
+
+def legacy_validate(df_upload):
+    """The iterrows() loop Tab 4 used before validation.py."""
+    df_upload["is_valid"] = True
+    df_upload["errors"] = ""
+    for idx, row in df_upload.iterrows():
+        errors = []
+        if pd.isna(row.get("name")) or pd.isna(row.get("contact_number")):
+            errors.append("Missing name/contact")
+        if row.get("status") not in LEAD_STATUSES:
+            errors.append("Invalid status")
+        if row.get("source") not in LEAD_SOURCES:
+            errors.append("Invalid source")
+        if row.get("licence") not in LICENCE_OPTIONS:
+            errors.append("Invalid licence (must be Unknown/yes/no)")
+        if errors:
+            df_upload.at[idx, "is_valid"] = False
+            df_upload.at[idx, "errors"] = ", ".join(errors)
+    return df_upload
+
+
+def _time(fn, df):
+    started = time.perf_counter()
+    fn(df)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'loop (s)':>10} {'vectorized (s)':>15} {'speedup':>8}")
+    for n in args.sizes:
+        df = make_upload_frame(n, seed=args.seed)
+        loop = _time(legacy_validate, df.copy())
+        vectorized = _time(validate_leads, df.copy())
+        print(f"{n:>10} {loop:>10.3f} {vectorized:>15.3f} {loop / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Hammer one lead's status from many threads and check lead_history stays consistent.
+
+    python -m benchmarks.stress_status_history [--threads 16] [--updates 50]
+
+Needs a PostgreSQL database (DATABASE_URL or DB_*) migrated with
+migrations.py. A throwaway lead is created and deleted again. Exits 1 if
+the history chain is broken: every row's old_status must equal the
+previous row's new_status, and the last new_status must be the lead's
+final status.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+import uuid
+
+from db import DB_POOL_MAX_OVERFLOW, DB_POOL_SIZE, delete_lead, get_connection, update_lead_status
+from validation import LEAD_STATUSES
+
+
+def _create_lead():
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO leads (name, contact_number, source, status, updated_at)
+                VALUES (%s, %s, 'Other', 'pending', NOW())
+                RETURNING id
+                """,
+                ("stress test", f"stress-{uuid.uuid4().hex[:12]}"),
+            )
+            return cur.fetchone()[0]
+
+
+def _worker(lead_id, contact, updates, seed, errors):
+    rng = random.Random(seed)
+    try:
+        for _ in range(updates):
+            update_lead_status(
+                lead_id, "stress test", contact, "Other", rng.choice(LEAD_STATUSES), notes="stress"
+            )
+    except Exception as e:
+        errors.append(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=min(16, DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW))
+    parser.add_argument("--updates", type=int, default=50, help="updates per thread")
+    args = parser.parse_args()
+
+    lead_id = _create_lead()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT contact_number FROM leads WHERE id = %s", (lead_id,))
+            contact = cur.fetchone()[0]
+
+    errors = []
+    threads = [
+        threading.Thread(target=_worker, args=(lead_id, contact, args.updates, seed, errors))
+        for seed in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT old_status, new_status FROM lead_history WHERE lead_id = %s ORDER BY id",
+                (lead_id,),
+            )
+            history = cur.fetchall()
+            cur.execute("SELECT status FROM leads WHERE id = %s", (lead_id,))
+            final_status = cur.fetchone()[0]
+    delete_lead(lead_id)
+
+    expected = "pending"
+    broken = 0
+    for old_status, new_status in history:
+        if old_status != expected or old_status == new_status:
+            broken += 1
+        expected = new_status
+
+    total = args.threads * args.updates
+    print(f"{total} updates from {args.threads} threads in {elapsed:.2f}s "
+          f"({total / elapsed:.0f}/s), {len(history)} history rows")
+    if errors:
+        print(f"FAIL: {len(errors)} worker errors, first: {errors[0]!r}")
+        return 1
+    if broken or expected != final_status:
+        print(f"FAIL: {broken} history rows out of sequence; final status {final_status!r}, "
+              f"history ends at {expected!r}")
+        return 1
+    print("OK: history chain is consistent")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
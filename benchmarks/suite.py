@@ -0,0 +1,307 @@
+"""Time the core db.py operations, the app's filter pipelines, upload validation and export.
+
+    python -m benchmarks.suite [--sizes 1000 10000 100000] [--repeat 5] [--out results.json]
+    python -m benchmarks.suite --compare baseline.json results.json
+
+Runs against a throwaway SQLite database (db_sqlite) unless DATABASE_URL or
+DB_BACKEND is set, in which case it seeds and reuses tagged synthetic rows
+like bench_search. For each size the database is grown to that many
+synthetic leads (plus their lead_history) and every case is timed; the
+results are written as JSON, one record per (size, case), so two runs can be
+compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+# the embedded backend unless a database is configured; db reads this on import
+_SCRATCH_DIR = None
+if not (os.getenv("DATABASE_URL") or os.getenv("DB_BACKEND")):
+    _SCRATCH_DIR = tempfile.mkdtemp(prefix="leadtracker-bench-")
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.join(_SCRATCH_DIR, "leads.db")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import db  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    BENCH_TAG, FIRST_NAMES, copy_history, copy_leads, count_bench_leads, make_history_frame,
+    make_leads_frame, make_upload_frame, synthetic_contact,
+)
+from export import write_export  # noqa: E402
+from validation import LEAD_SOURCES, LEAD_STATUSES, validate_leads  # noqa: E402
+
+# contact numbers for rows the write cases insert: outside synthetic_contact()'s 6xxx-9xxx range
+_WRITE_CONTACT_BASE = 5_000_000_000
+
+
+def _seed(rows, seed):
+    """Grow the synthetic leads (and their history) to ``rows``; returns the synthetic lead count."""
+    existing = count_bench_leads()
+    if existing >= rows:
+        return existing
+    last_id = pd.read_sql("SELECT COALESCE(MAX(id), 0) AS n FROM leads", db.engine)["n"].iloc[0]
+    copy_leads(make_leads_frame(rows - existing, seed=seed + existing, start=existing))
+    new = pd.read_sql(
+        f"SELECT id, status, created_at FROM leads WHERE id > {int(last_id)} ORDER BY id", db.engine
+    )
+    copy_history(make_history_frame(new, seed=seed + existing))
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE")
+    return rows
+
+
+def _measure(fn, repeat, setup=None):
+    """Run ``fn`` ``repeat`` times (``setup`` untimed before each run); timings in ms."""
+    timings = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        started = time.perf_counter()
+        fn(arg) if setup else fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    p50, p95 = np.percentile(timings, [50, 95])
+    return {
+        "runs": repeat,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "mean_ms": round(float(np.mean(timings)), 3),
+        "min_ms": round(float(np.min(timings)), 3),
+    }
+
+
+# --- Cases ---
+# The cached db.py entry points are timed through __wrapped__ so every run
+# reaches the database instead of st.cache_data.
+def _read_cases(rng, rows):
+    def tab1_filters():
+        # All Leads: status/source/licence selectboxes, one 50-row page
+        return {"status": rng.choice(LEAD_STATUSES), "source": rng.choice(LEAD_SOURCES),
+                "first_contacted": None, "licence": rng.choice(["yes", "no"]), "scheduled_walk_in": None}
+
+    def tab3_filters():
+        # Manage Leads: status/source and a "Date Between" range, one 100-row page
+        start = date(2024, 1, 1) + pd.Timedelta(days=rng.randrange(500))
+        return {"status": rng.choice(LEAD_STATUSES), "source": rng.choice(LEAD_SOURCES),
+                "first_contacted_between": (start, start + pd.Timedelta(days=60))}
+
+    deep_page = max(1, rows // 50 // 2)
+    return {
+        "db.get_all_leads (full load)": (db.get_all_leads, True),
+        "db.query_leads first page": (lambda: db._query_leads.__wrapped__(0, {}, 1, 50, "newest", None), False),
+        "db.query_leads deep OFFSET page": (
+            lambda: db._query_leads.__wrapped__(0, {}, deep_page, 50, "newest", None), False
+        ),
+        "db.query_leads keyset page": (
+            lambda: db._query_leads.__wrapped__(0, {}, 2, 50, "newest", rng.randrange(rows) + 1), False
+        ),
+        "db.get_lead_facets": (lambda: db._get_lead_facets.__wrapped__(0), False),
+        "db.get_lead_analytics": (lambda: db._get_lead_analytics.__wrapped__(0, 12), False),
+        "db.search_leads name": (lambda: db._run_search(rng.choice(FIRST_NAMES), None, db.SEARCH_LIMIT), False),
+        "db.search_leads phone": (
+            lambda: db._run_search(synthetic_contact(rng.randrange(rows))[:6], None, db.SEARCH_LIMIT), False
+        ),
+        "app Tab 1 filter + page": (
+            lambda: db._query_leads.__wrapped__(0, tab1_filters(), 1, 50, "newest", None), False
+        ),
+        "app Tab 3 filter + page": (
+            lambda: db._query_leads.__wrapped__(0, tab3_filters(), 1, 100, "newest", None), False
+        ),
+    }
+
+
+def _editor_changes(df_editor, df_edited, editable_columns):
+    """The edit diff Tab 3 computes on every rerun (see app.py)."""
+    before, after = df_editor[editable_columns], df_edited[editable_columns]
+    changed = ~((before == after) | (before.isna() & after.isna())).all(axis=1)
+    to_delete = df_edited["delete"]
+    return df_edited[changed & ~to_delete].to_dict("records"), df_edited.loc[to_delete, "id"].tolist()
+
+
+def _editor_case(rng):
+    editable = ["name", "contact_number", "source", "status", "first_contacted",
+                "licence", "scheduled_walk_in", "notes"]
+    page = db._query_leads.__wrapped__(0, {}, 1, 100, "newest", None)["rows"]
+    df_editor = page[["id"] + editable].reset_index(drop=True)
+    df_editor["delete"] = False
+
+    def setup():
+        df_edited = df_editor.copy()
+        for i in rng.sample(range(len(df_edited)), min(5, len(df_edited))):
+            df_edited.loc[i, "notes"] = "edited"
+        return df_edited
+
+    return lambda df_edited: _editor_changes(df_editor, df_edited, editable), setup
+
+
+def _write_cases(rng):
+    counter = iter(range(10**9))
+    leads = pd.read_sql(
+        "SELECT id, name, contact_number FROM leads WHERE notes LIKE '%%" + BENCH_TAG + "'", db.engine
+    ).to_dict("records")
+
+    def contact():
+        return str(_WRITE_CONTACT_BASE + next(counter))
+
+    def update_status():
+        lead = rng.choice(leads)
+        db.update_lead_status(lead["id"], lead["name"], lead["contact_number"], rng.choice(LEAD_SOURCES),
+                              rng.choice(LEAD_STATUSES), notes=f"status {BENCH_TAG}")
+
+    def batch_changes():
+        return [
+            {**lead, "source": rng.choice(LEAD_SOURCES), "status": rng.choice(LEAD_STATUSES),
+             "licence": "yes", "notes": f"batch {BENCH_TAG}"}
+            for lead in rng.sample(leads, min(100, len(leads)))
+        ]
+
+    def upload():
+        df = make_upload_frame(1000, seed=rng.randrange(10**6), invalid_ratio=0)
+        df["contact_number"] = [contact() for _ in range(len(df))]
+        df["notes"] = f"upload {BENCH_TAG}"
+        return df
+
+    def inserted_ids(df):
+        return pd.read_sql(
+            f"SELECT id FROM leads WHERE contact_number IN ({', '.join(map(repr, df['contact_number']))})",
+            db.engine,
+        )["id"].tolist()
+
+    def insert_then_ids():
+        df = upload()
+        db.bulk_insert_leads(df)
+        return inserted_ids(df)
+
+    return {
+        "db.insert_lead": (
+            lambda: db.insert_lead(name="Bench", contact=contact(), address="", source="Other",
+                                   status="pending", notes=f"insert {BENCH_TAG}"), None
+        ),
+        "db.update_lead_status": (update_status, None),
+        "db.update_leads_batch (100 rows)": (lambda changes: db.update_leads_batch(changes), batch_changes),
+        "db.bulk_insert_leads (1000 rows)": (lambda df: db.bulk_insert_leads(df), upload),
+        "db.delete_leads (1000 rows)": (lambda ids: db.delete_leads(ids), insert_then_ids),
+    }
+
+
+def _delete_written_rows():
+    """Remove the leads the write cases inserted, so the next size starts from synthetic rows only."""
+    # their number range and their tag: never real leads that happen to start with a 5
+    ids = pd.read_sql(
+        f"SELECT id FROM leads WHERE contact_number LIKE '{str(_WRITE_CONTACT_BASE)[0]}%%' "
+        f"AND notes LIKE '%%{BENCH_TAG}'",
+        db.engine,
+    )
+    db.delete_leads(ids["id"].tolist())
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, heavy_repeat, seed):
+    rng = random.Random(seed)
+    results = []
+
+    def record(size, group, case, stats):
+        results.append({"size": size, "group": group, "case": case, **stats})
+        print(f"{size:>9} {group:<10} {case:<36} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f}")
+
+    print(f"{'rows':>9} {'group':<10} {'case':<36} {'p50 ms':>10} {'p95 ms':>10}")
+    for size in sorted(sizes):
+        rows = _seed(size, seed)
+        for case, (fn, heavy) in _read_cases(rng, rows).items():
+            fn()  # warm the page cache and connection pool
+            record(size, "read", case, _measure(fn, heavy_repeat if heavy else repeat))
+        fn, setup = _editor_case(rng)
+        record(size, "app", "app Tab 3 edit diff (100-row page)", _measure(fn, repeat, setup))
+        for case, (fn, setup) in _write_cases(rng).items():
+            record(size, "write", case, _measure(fn, repeat, setup))
+        _delete_written_rows()
+
+        upload = make_upload_frame(size, seed=seed)
+        record(size, "validate", "validate_leads", _measure(lambda: validate_leads(upload.copy()), heavy_repeat))
+        export_dir = tempfile.mkdtemp(prefix="leadtracker-export-")
+        try:
+            for fmt in ("xlsx", "csv"):
+                path = os.path.join(export_dir, f"leads.{fmt}")
+                record(size, "export", f"write_export {fmt}",
+                       _measure(lambda: write_export(path, None, fmt), heavy_repeat))
+        finally:
+            shutil.rmtree(export_dir, ignore_errors=True)
+    return results
+
+
+def compare(baseline_path, current_path):
+    """Print p50 per (size, case) for two result files and the current/baseline ratio."""
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["case"]): r for r in json.load(f)["results"]}
+    with open(current_path) as f:
+        current = json.load(f)["results"]
+    print(f"{'rows':>9} {'case':<36} {'base p50':>10} {'p50 ms':>10} {'ratio':>7}")
+    for r in current:
+        base = baseline.get((r["size"], r["case"]))
+        if base is None:
+            continue
+        ratio = r["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("nan")
+        print(f"{r['size']:>9} {r['case']:<36} {base['p50_ms']:>10.2f} {r['p50_ms']:>10.2f} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="synthetic lead counts, 1k to 1M")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case")
+    parser.add_argument("--heavy-repeat", type=int, default=3,
+                        help="runs per full-table case (full load, validation, export)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+
+    try:
+        if args.compare:
+            compare(*args.compare)
+            return
+        results = run(args.sizes, args.repeat, args.heavy_repeat, args.seed)
+    finally:
+        if _SCRATCH_DIR:
+            db.engine.dispose()
+            shutil.rmtree(_SCRATCH_DIR, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "backend": db.engine.dialect.name,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "sizes": sorted(args.sizes),
+            "repeat": args.repeat,
+            "heavy_repeat": args.heavy_repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {len(results)} results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Seeded synthetic lead data for benchmarks."""
+import numpy as np
+import pandas as pd
+
+from validation import LEAD_SOURCES, LEAD_STATUSES, LICENCE_OPTIONS
+
+
+def make_upload_frame(n, seed=0, invalid_ratio=0.05):
+    """Build an upload-shaped DataFrame of ``n`` leads.
+
+    Roughly ``invalid_ratio`` of the rows get a bad status, source, licence,
+    date or a missing name so validation has real work to do.
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2024-01-01")
+    df = pd.DataFrame({
+        "name": [f"Lead {i}" for i in range(n)],
+        "contact_number": (9_000_000_000 + rng.permutation(n)).astype(str),
+        "address": "Somewhere",
+        "source": rng.choice(LEAD_SOURCES, n),
+        "status": rng.choice(LEAD_STATUSES, n),
+        "first_contacted": (start + rng.integers(0, 600, n).astype("timedelta64[D]")).astype(str),
+        "licence": rng.choice(LICENCE_OPTIONS, n),
+        "scheduled_walk_in": None,
+        "notes": "",
+    })
+
+    bad = rng.random(n) < invalid_ratio
+    kind = rng.integers(0, 5, n)
+    df.loc[bad & (kind == 0), "name"] = None
+    df.loc[bad & (kind == 1), "status"] = "lost"
+    df.loc[bad & (kind == 2), "source"] = "Billboard"
+    df.loc[bad & (kind == 3), "licence"] = "maybe"
+    df.loc[bad & (kind == 4), "first_contacted"] = "not a date"
+    return df
+
+
+# --- Realistic leads for database benchmarks ---
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Akshay", "Ananya", "Arjun", "Deepa", "Farhan", "Gita", "Ishaan", "Kavya",
+    "Manoj", "Meera", "Nikhil", "Pooja", "Rahul", "Ravi", "Sanjay", "Sneha", "Suresh", "Vikram",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Iyer", "Nair", "Reddy", "Khan", "Patel", "Gupta", "Das", "Menon",
+    "Kumar", "Singh", "Joshi", "Rao", "Pillai", "Bose", "Mehta", "Shetty", "Naidu", "Chopra",
+]
+AREAS = [
+    "MG Road", "Indiranagar", "Koramangala", "Whitefield", "Jayanagar", "HSR Layout",
+    "Malleshwaram", "Banashankari", "Yelahanka", "Hebbal", "Marathahalli", "BTM Layout",
+]
+NOTE_WORDS = [
+    "call", "back", "evening", "weekend", "interested", "price", "discount", "batch", "morning",
+    "manual", "automatic", "test", "slot", "referral", "follow", "up", "busy", "licence", "renewal",
+]
+# tag appended to notes so benchmark rows can be found and removed again
+BENCH_TAG = "#bench"
+
+
+# synthetic lead i gets number CONTACT_BASE + i * CONTACT_STRIDE: unique, and
+# spread over 6xxx-9xxx like real mobiles rather than sharing one prefix
+CONTACT_BASE = 6_000_000_000
+CONTACT_STRIDE = 3_989
+
+
+def synthetic_contact(i):
+    return str(CONTACT_BASE + i * CONTACT_STRIDE)
+
+
+def make_leads_frame(n, seed=0, start=0):
+    """Build ``n`` realistic leads (names, addresses, notes, mixed phone formats).
+
+    Leads are numbered from ``start``; contact numbers come from
+    synthetic_contact() written in a mix of formats ("+91 60000 03989",
+    "060000-03989", "6000003989").
+    """
+    rng = np.random.default_rng(seed)
+    numbers = (CONTACT_BASE + np.arange(start, start + n, dtype=np.int64) * CONTACT_STRIDE).astype(str)
+    fmt = rng.integers(0, 3, n)
+    contacts = np.where(
+        fmt == 0, "+91 " + pd.Series(numbers).str[:5] + " " + pd.Series(numbers).str[5:],
+        np.where(fmt == 1, "0" + pd.Series(numbers).str[:5] + "-" + pd.Series(numbers).str[5:], numbers),
+    )
+    start = np.datetime64("2024-01-01")
+    created = start + rng.integers(0, 600, n).astype("timedelta64[D]")
+    first_contacted = created + rng.integers(0, 3, n).astype("timedelta64[D]")
+    walk_in = first_contacted + rng.integers(1, 30, n).astype("timedelta64[D]")
+    has_walk_in = rng.random(n) < 0.3
+    notes = [
+        " ".join(words) + " " + BENCH_TAG
+        for words in rng.choice(NOTE_WORDS, (n, 4))
+    ]
+    return pd.DataFrame({
+        "name": pd.Series(rng.choice(FIRST_NAMES, n)) + " " + pd.Series(rng.choice(LAST_NAMES, n)),
+        "contact_number": contacts,
+        "address": pd.Series(rng.integers(1, 400, n).astype(str)) + " " + pd.Series(rng.choice(AREAS, n)) + " Bangalore",
+        "source": rng.choice(LEAD_SOURCES, n),
+        "status": rng.choice(LEAD_STATUSES, n, p=[0.4, 0.3, 0.2, 0.1]),
+        "first_contacted": first_contacted.astype(str),
+        "notes": notes,
+        "licence": rng.choice(LICENCE_OPTIONS, n),
+        "scheduled_walk_in": pd.Series(walk_in.astype(str)).where(has_walk_in, None),
+        "created_at": pd.Series(created.astype(str)) + " 09:00:00",
+    })
+
+
+# history rows needed to reach each status: pending -> processing, then
+# processing -> onboarded / rejected
+_STATUS_STEPS = {"pending": 0, "processing": 1, "onboarded": 2, "rejected": 2}
+
+
+def make_history_frame(leads, seed=0):
+    """Build the lead_history rows that take each of ``leads`` to its status.
+
+    ``leads`` needs id, status and created_at columns. Each step comes 4 hours
+    to 2 weeks after the previous one; with make_leads_frame's status mix
+    there are about 0.9 history rows per lead.
+    """
+    rng = np.random.default_rng(seed)
+    steps = leads["status"].astype(str).map(_STATUS_STEPS).fillna(0).astype(int).to_numpy()
+    total = int(steps.sum())
+    step = np.arange(total) - np.repeat(np.cumsum(steps) - steps, steps)
+    final = np.repeat(leads["status"].astype(str).to_numpy(), steps)
+    created = pd.to_datetime(leads["created_at"])
+    if created.dt.tz is not None:
+        created = created.dt.tz_convert("UTC").dt.tz_localize(None)
+
+    hours = rng.integers(4, 24 * 14, total)
+    # the second step comes after the first one's wait as well
+    hours = hours + np.where(step == 1, np.roll(hours, 1), 0)
+    changed_at = np.repeat(created.to_numpy(), steps) + hours.astype("timedelta64[h]")
+    return pd.DataFrame({
+        "lead_id": np.repeat(leads["id"].to_numpy(), steps),
+        "old_status": np.where(step == 0, "pending", "processing"),
+        "new_status": np.where(step == 0, "processing", final),
+        "changed_at": pd.Series(changed_at).astype(str),
+        "notes": BENCH_TAG,
+    })
+
+
+def _placeholder():
+    from db import engine
+
+    return "?" if engine.dialect.paramstyle == "qmark" else "%s"
+
+
+def copy_rows(table, df, chunk_rows=100_000):
+    """Load a frame into ``table``: COPY on PostgreSQL (much faster than INSERT for seeding), executemany on SQLite."""
+    import io
+
+    from db import engine, get_connection
+
+    columns = ", ".join(df.columns)
+    insert = f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['?'] * len(df.columns))})"
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for start in range(0, len(df), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                if engine.dialect.name == "sqlite":
+                    chunk = chunk.astype(object).where(chunk.notna(), None)
+                    cur.executemany(insert, chunk.itertuples(index=False, name=None))
+                    continue
+                buffer = io.StringIO()
+                chunk.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def copy_leads(df, chunk_rows=100_000):
+    copy_rows("leads", df, chunk_rows)
+
+
+def copy_history(df, chunk_rows=100_000):
+    copy_rows("lead_history", df, chunk_rows)
+
+
+def count_bench_leads():
+    from db import get_connection
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM leads WHERE notes LIKE {_placeholder()}", (f"%{BENCH_TAG}",))
+            return cur.fetchone()[0]
+
+
+def delete_bench_leads():
+    """Delete the synthetic leads, archived ones included; their history goes with them (trigger)."""
+    from db import get_connection
+
+    deleted = 0
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for table in ("leads", "leads_archive"):
+                cur.execute(f"DELETE FROM {table} WHERE notes LIKE {_placeholder()}", (f"%{BENCH_TAG}",))
+                deleted += cur.rowcount
+    return deleted
@@ -1,102 +1,495 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
 import pandas as pd
-import psycopg2
 import streamlit as st
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from urllib.parse import quote_plus
+import metrics
+from lead_cache import LeadCacheVersion
+from lead_queries import (
+    ALL_DAILY_COUNTS, CLOSED_STATUSES, LEAD_COLUMNS, LEAD_SELECT_COLUMNS, LEAD_SORTS,
+    archive_cutoff, build_lead_where, lead_source, where,
+)
+from validation import LEAD_SOURCES, LEAD_STATUSES, LICENCE_OPTIONS
 
 # Load local .env when present
 if os.path.exists(".env"):
     from dotenv import load_dotenv
     load_dotenv()
 
-DB_HOST = os.getenv("DB_HOST") or st.secrets.get("DB_HOST")
-DB_PORT = os.getenv("DB_PORT") or st.secrets.get("DB_PORT")
-DB_NAME = os.getenv("DB_NAME") or st.secrets.get("DB_NAME")
-DB_USER = os.getenv("DB_USER") or st.secrets.get("DB_USER")
-DB_PASS = os.getenv("DB_PASS") or st.secrets.get("DB_PASS")
+
+def _setting(name, default=None):
+    """Read a setting from the environment, falling back to st.secrets."""
+    value = os.getenv(name)
+    if value:
+        return value
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        # No secrets.toml configured (local runs, CI)
+        return default
+
+
+DB_HOST = _setting("DB_HOST")
+DB_PORT = _setting("DB_PORT")
+DB_NAME = _setting("DB_NAME")
+DB_USER = _setting("DB_USER")
+DB_PASS = _setting("DB_PASS")
+DB_SSLMODE = _setting("DB_SSLMODE", "require")
+
+# Full SQLAlchemy URL; overrides the DB_* settings above when set
+# (e.g. a local PostgreSQL, or "sqlite:///leads.db")
+DATABASE_URL = _setting("DATABASE_URL")
+
+# "postgres" (default, db_postgres) or "sqlite": the embedded backend in db_sqlite, for
+# offline development, CI and benchmarks without a server. A sqlite://
+# DATABASE_URL selects it too.
+DB_BACKEND = _setting("DB_BACKEND", "postgres")
+SQLITE_PATH = _setting("SQLITE_PATH", "leads.db")
+
+# --- Connection pool settings ---
+DB_POOL_SIZE = int(_setting("DB_POOL_SIZE", 5))
+DB_POOL_MAX_OVERFLOW = int(_setting("DB_POOL_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = int(_setting("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(_setting("DB_POOL_RECYCLE", 1800))
+
+# --- Archive (see archive.py) ---
+# Closed leads untouched for this many days move to leads_archive
+ARCHIVE_AFTER_DAYS = int(_setting("ARCHIVE_AFTER_DAYS", 180))
+
+# --- Background jobs (see jobs.py) ---
+# Worker threads started inside the Streamlit server; set JOBS_IN_APP=0 when
+# a separate `python jobs.py` worker runs them instead
+JOB_WORKERS = int(_setting("JOB_WORKERS", 2))
+JOBS_IN_APP = str(_setting("JOBS_IN_APP", "1")).lower() in ("1", "true", "yes")
+# uploads waiting to be inserted and finished exports
+JOBS_DIR = _setting("JOBS_DIR", ".jobs")
+
+# --- Instrumentation (see metrics.py) ---
+# Off unless METRICS_ENABLED is set; METRICS_PORT also serves /metrics
+METRICS_ENABLED = str(_setting("METRICS_ENABLED", "")).lower() in ("1", "true", "yes")
+METRICS_PORT = _setting("METRICS_PORT")
+metrics.configure(METRICS_ENABLED, METRICS_PORT)
+
+
+# --- Connection pool stats ---
+@st.cache_resource(show_spinner=False)
+def _shared_pool_stats():
+    # process-wide like the engine, so the counters survive a module reload too
+    return {"hits": 0, "misses": 0, "invalidated": 0}, threading.Lock()
+
+
+_pool_stats, _pool_stats_lock = _shared_pool_stats()
+
+
+def _bump_pool_stat(key):
+    with _pool_stats_lock:
+        _pool_stats[key] += 1
+
+
+def _on_pool_connect(dbapi_connection, connection_record):
+    connection_record.info["fresh"] = True
+
+
+def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    # A checkout that had to open a new connection is a miss; reuse is a hit
+    _bump_pool_stat("misses" if connection_record.info.pop("fresh", False) else "hits")
+
+
+def _on_pool_invalidate(dbapi_connection, connection_record, exception):
+    _bump_pool_stat("invalidated")
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_engine(url, connect_args):
+    """One engine (and pool) per URL for the life of the process.
+
+    Cached as a resource so re-importing db.py (Streamlit reloads changed
+    modules) reuses the pool instead of opening a second one.
+    """
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        # health check on checkout; stale connections are replaced transparently
+        pool_pre_ping=True,
+    )
+    event.listen(engine, "connect", _on_pool_connect)
+    event.listen(engine, "checkout", _on_pool_checkout)
+    event.listen(engine, "invalidate", _on_pool_invalidate)
+    return engine
+
+
+def _build_engine():
+    if DATABASE_URL:
+        url = DATABASE_URL
+        connect_args = {}
+    elif DB_BACKEND == "sqlite":
+        url = f"sqlite:///{SQLITE_PATH}"
+        connect_args = {}
+    else:
+        password = quote_plus(DB_PASS or "")
+        url = f"postgresql+psycopg2://{DB_USER}:{password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+        connect_args = {"sslmode": DB_SSLMODE}
+
+    if url.startswith("sqlite"):
+        # Streamlit serves sessions from several threads
+        connect_args["check_same_thread"] = False
+
+    return _shared_engine(url, connect_args)
+
 
 # --- SQLAlchemy Engine (for pandas) ---
-password = quote_plus(DB_PASS)
-engine = create_engine(
-    f"postgresql+psycopg2://{DB_USER}:{password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+# Its pool is the single process-wide pool: get_connection() below checks
+# raw DBAPI connections out of it as well.
+engine = _build_engine()
 
+# --- Storage backend ---
+# The functions below keep connection handling, caching, cache invalidation
+# and metrics here, and hand the SQL that differs between PostgreSQL and
+# SQLite to the backend object; both have the same methods.
+if engine.dialect.name == "sqlite":
+    from db_sqlite import SQLiteBackend as _Backend
+else:
+    from db_postgres import PostgresBackend as _Backend
+_backend = _Backend(engine)
+_backend.init_schema()
+
+# Driver errors the write paths catch
+_DB_ERRORS = _backend.DB_ERRORS
+_UNIQUE_VIOLATION = _backend.UNIQUE_VIOLATION
+
+
+def get_pool_stats():
+    """Return pool hit/miss counters plus the current pool occupancy."""
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    pool = engine.pool
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+
+@contextmanager
 def get_connection():
-    return psycopg2.connect(
-        host=DB_HOST,
-        port=int(DB_PORT) if DB_PORT else None,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS,
-        sslmode="require"
-    )
+    """Check a DBAPI connection out of the shared pool.
+
+    Commits on success and rolls back on error. The connection goes back to
+    the pool afterwards; if the error was a disconnect it is invalidated
+    instead so the next checkout reconnects. SQLite begins the transaction
+    with the write lock held (BEGIN IMMEDIATE).
+    """
+    with _backend.connection() as conn:
+        yield conn
 
 # --- Cached Query for Leads ---
-@st.cache_data(ttl=60)
+# lead_cache's version keys the query caches below, so writes never have to
+# wipe st.cache_data app-wide (see lead_cache.py for other processes' writes).
+# LEAD_SELECT_COLUMNS (lead_queries) are the columns handed to the UI.
+
+# In-memory column types for lead frames
+_CATEGORY_COLUMNS = {"status": LEAD_STATUSES, "source": LEAD_SOURCES, "licence": LICENCE_OPTIONS}
+_DATE_COLUMNS = ["first_contacted", "scheduled_walk_in"]
+_TIMESTAMP_COLUMNS = ["created_at", "updated_at"]
+
+
+def compact_leads(df):
+    """Give a leads frame compact, parsed column types (in place; returns ``df``).
+
+    status/source/licence become categoricals over the known values plus any
+    others present, so frames loaded at different times share one dtype and
+    concatenate without falling back to object. The date columns are parsed
+    to datetime64 here, once, instead of by every caller.
+    """
+    for column, known in _CATEGORY_COLUMNS.items():
+        if column in df.columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                present = values.cat.categories
+            else:
+                present = values.dropna().unique()
+            extra = sorted(set(present) - set(known))
+            df[column] = values.astype(pd.CategoricalDtype(list(known) + extra))
+    for column in _DATE_COLUMNS:
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    for column in _TIMESTAMP_COLUMNS:
+        # already tz-aware from PostgreSQL; UTC text from SQLite
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], errors="coerce", utc=True)
+    return df
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_lead_cache():
+    # process-wide like the engine, so a module reload keeps the version counting up
+    return LeadCacheVersion()
+
+
+lead_cache = _shared_lead_cache()
+metrics.add_source("lead_cache", lead_cache.stats)
+metrics.add_source("pool", get_pool_stats)
+
+
+def invalidate_lead_cache():
+    """Make later cached lead reads miss after a write."""
+    lead_cache.bump()
+
+
+def get_lead_cache_stats():
+    return lead_cache.stats()
+
+
+@metrics.instrument("db.get_all_leads")
 def get_all_leads():
-    return pd.read_sql("SELECT * FROM leads ORDER BY id DESC", engine)
+    """Every lead, newest first, typed by compact_leads(). Not cached: the app pages in SQL."""
+    return compact_leads(pd.read_sql(f"SELECT {LEAD_SELECT_COLUMNS} FROM leads ORDER BY id DESC", engine))
 
-def insert_lead(
-    name,
-    contact,
-    address,
-    source,
-    status,
-    first_contacted=None,
-    notes=None,
-    licence="no",
-    scheduled_walk_in=None
-):
-    # ensure licence is always a string "yes"/"no" or None
-    if isinstance(licence, str):
-        licence = licence.lower()
-    else:
-        licence = None
+# --- Server-side filtering & pagination ---
+# Filters, sorts and the archive scope are built by lead_queries, which the
+# backends share.
 
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO leads (
-                    name, contact_number, address, source, status,
-                    first_contacted, notes, licence, scheduled_walk_in
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    name,
-                    contact,
-                    address,
-                    source,
-                    status,
-                    first_contacted if first_contacted else None,
-                    notes,
-                    licence,
-                    scheduled_walk_in if scheduled_walk_in else None
-                )
-            )
-        conn.commit()
-    st.cache_data.clear()
 
+@metrics.instrument("db.query_leads")
+def query_leads(filters=None, page=1, page_size=50, sort="newest", after_id=None):
+    """Fetch one page of leads matching ``filters``, filtered and paged in SQL.
+
+    Pass ``after_id`` (the ``next_after_id`` of the previous page) for keyset
+    pagination; without it the page is located with OFFSET. ``page_size=None``
+    returns every matching row. Archived leads are left out unless
+    ``filters["archived"]`` is "include" or "only". Returns a dict with the page ``rows``
+    DataFrame, the ``total`` match count and ``next_after_id``.
+    """
+    with lead_cache.reading() as version:
+        return _query_leads(version, filters, page, page_size, sort, after_id)
+
+
+def _lead_page_sql(filters, page, page_size, sort, after_id):
+    """(count SQL, count params, page SQL, page params) for query_leads()."""
+    if sort not in LEAD_SORTS:
+        raise ValueError(f"Unknown lead sort: {sort}")
+    direction, comparison = LEAD_SORTS[sort]
+    clauses, params = build_lead_where(filters)
+    source = lead_source(filters, _backend.ARCHIVE_SCOPE_COLUMNS)
+    count_sql = f"SELECT COUNT(*) AS n FROM {source}{where(clauses)}"
+
+    page_params = dict(params)
+    if after_id is not None:
+        clauses = clauses + [f"id {comparison} %(after_id)s"]
+        page_params["after_id"] = int(after_id)
+    sql = f"SELECT {LEAD_SELECT_COLUMNS} FROM {source}{where(clauses)} ORDER BY id {direction}"
+    if page_size is not None:
+        sql += " LIMIT %(limit)s"
+        page_params["limit"] = int(page_size)
+        if after_id is None and page > 1:
+            sql += " OFFSET %(offset)s"
+            page_params["offset"] = (int(page) - 1) * int(page_size)
+    return count_sql, params, sql, page_params
+
+
+def _page_result(rows, total, page, page_size):
+    compact_leads(rows)
+    full_page = page_size is not None and len(rows) == page_size
+    return {
+        "rows": rows,
+        "total": int(total),
+        "page": page,
+        "page_size": page_size,
+        "next_after_id": int(rows["id"].iloc[-1]) if full_page else None,
+    }
+
+
+@st.cache_data(ttl=60, max_entries=500)
+@metrics.instrument("db.query_leads" + metrics.UNCACHED_SUFFIX)
+def _query_leads(version, filters, page, page_size, sort, after_id):
+    lead_cache.miss()
+    count_sql, params, sql, page_params = _lead_page_sql(filters, page, page_size, sort, after_id)
+    total = _backend.read_sql(count_sql, params)["n"].iloc[0]
+    rows = _backend.read_sql(sql, page_params)
+    return _page_result(rows, total, page, page_size)
+
+
+# --- Filter facets ---
+# Status/source values with their lead counts come from lead_daily_counts
+# (migration 5), which the leads triggers keep current on every insert,
+# update and delete; the date bounds are MIN/MAX over an indexed column.
+# None of these read the leads table row by row.
+_FACET_SQL = {
+    "status": """
+        SELECT status AS value, SUM(lead_count) AS leads FROM lead_daily_counts
+        WHERE status <> '' GROUP BY status HAVING SUM(lead_count) > 0 ORDER BY status
+    """,
+    "source": """
+        SELECT source AS value, SUM(lead_count) AS leads FROM lead_daily_counts
+        WHERE source <> '' GROUP BY source HAVING SUM(lead_count) > 0 ORDER BY source
+    """,
+    "bounds": "SELECT MIN(first_contacted) AS min_date, MAX(first_contacted) AS max_date FROM leads",
+}
+
+
+def _facets_result(status, source, min_date, max_date):
+    status_counts = {value: int(n) for value, n in zip(status["value"], status["leads"])}
+    source_counts = {value: int(n) for value, n in zip(source["value"], source["leads"])}
+    return {
+        "statuses": list(status_counts),
+        "sources": list(source_counts),
+        "status_counts": status_counts,
+        "source_counts": source_counts,
+        "first_contacted_min": pd.to_datetime(min_date),
+        "first_contacted_max": pd.to_datetime(max_date),
+    }
+
+
+@metrics.instrument("db.get_lead_facets")
+def get_lead_facets():
+    """Filter facets: distinct statuses/sources (sorted), their lead counts and the first_contacted bounds."""
+    with lead_cache.reading() as version:
+        return _get_lead_facets(version)
+
+
+@st.cache_data(ttl=60, max_entries=20)
+@metrics.instrument("db.get_lead_facets" + metrics.UNCACHED_SUFFIX)
+def _get_lead_facets(version):
+    lead_cache.miss()
+    status = pd.read_sql(_FACET_SQL["status"], engine)
+    source = pd.read_sql(_FACET_SQL["source"], engine)
+    bounds = pd.read_sql(_FACET_SQL["bounds"], engine).iloc[0]
+    return _facets_result(status, source, bounds["min_date"], bounds["max_date"])
+
+
+# --- Analytics ---
+# Read from the rollup tables of migration 5, which triggers keep current,
+# so these queries cost the same however many leads there are.
+CONVERTED_STATUS = "onboarded"
+
+
+@metrics.instrument("db.get_lead_analytics")
+def get_lead_analytics(weeks=12):
+    """Funnel counts, weekly intake and stage-to-stage times for the dashboard.
+
+    Returns a dict of DataFrames: ``by_status`` and ``by_source`` (with the
+    share of leads that reached CONVERTED_STATUS), ``weekly`` lead intake by
+    status over the last ``weeks`` weeks, and ``stages``: each status
+    transition with its count and the average days spent in the old status.
+    """
+    with lead_cache.reading() as version:
+        return _get_lead_analytics(version, weeks)
+
+
+@st.cache_data(ttl=60, max_entries=20)
+@metrics.instrument("db.get_lead_analytics" + metrics.UNCACHED_SUFFIX)
+def _get_lead_analytics(version, weeks):
+    lead_cache.miss()
+    # ALL_DAILY_COUNTS: live and archived leads (migration 6); the funnel covers both
+    counts = pd.read_sql(
+        f"""
+        SELECT NULLIF(status, '') AS status, NULLIF(source, '') AS source, SUM(lead_count) AS leads
+        FROM {ALL_DAILY_COUNTS}
+        GROUP BY status, source
+        HAVING SUM(lead_count) > 0
+        """,
+        engine,
+    )
+    counts["leads"] = counts["leads"].astype("int64")
+    # intake per week (starting Monday) by status
+    weekly = _backend.read_sql(_backend.WEEKLY_COUNTS_SQL, {"days": (int(weeks) - 1) * 7})
+    weekly["leads"] = weekly["leads"].astype("int64")
+    stages = pd.read_sql(
+        """
+        SELECT old_status, new_status, transitions,
+               total_seconds / transitions / 86400.0 AS avg_days
+        FROM lead_transition_stats
+        WHERE transitions > 0
+        ORDER BY transitions DESC
+        """,
+        engine,
+    )
+
+    by_status = counts.groupby("status", dropna=False)["leads"].sum().reset_index()
+    by_source = counts.assign(
+        converted=counts["leads"].where(counts["status"] == CONVERTED_STATUS, 0)
+    ).groupby("source", dropna=False)[["leads", "converted"]].sum().reset_index()
+    by_source["conversion_rate"] = by_source["converted"] / by_source["leads"]
+    return {
+        "total": int(counts["leads"].sum()),
+        "converted": int(by_source["converted"].sum()),
+        "by_status": by_status,
+        "by_source": by_source.sort_values("leads", ascending=False, ignore_index=True),
+        "weekly": weekly,
+        "stages": stages,
+    }
+
+
+EXPORT_BATCH_ROWS = 5000
+
+
+def iter_leads(filters=None, sort="newest", batch_rows=EXPORT_BATCH_ROWS):
+    """Yield batches of row tuples for every lead matching ``filters``.
+
+    Tuples follow LEAD_SELECT_COLUMNS order. Rows are streamed (a
+    server-side cursor in PostgreSQL), so only ``batch_rows`` rows are held
+    in memory at a time however large the result is. The connection stays
+    checked out until the generator finishes.
+    """
+    _, _, sql, params = _lead_page_sql(filters, 1, None, sort, None)
+    yield from _backend.iter_lead_rows(sql, params, batch_rows)
+
+
+@metrics.instrument("db.get_lead_ids")
+def get_lead_ids(filters=None, after_id=None, limit=None):
+    """Ids of the leads matching ``filters``, ascending, from just past ``after_id``.
+
+    Not cached. For jobs that work through a large match in chunks: pass
+    the last id of one chunk as ``after_id`` to get the next.
+    """
+    clauses, params = build_lead_where(filters)
+    if after_id is not None:
+        clauses = clauses + ["id > %(after_id)s"]
+        params["after_id"] = int(after_id)
+    sql = f"SELECT id FROM {lead_source(filters, _backend.ARCHIVE_SCOPE_COLUMNS)}{where(clauses)} ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT %(limit)s"
+        params["limit"] = int(limit)
+    return [int(i) for i in _backend.read_sql(sql, params)["id"]]
+
+
+@metrics.instrument("db.lead_exists")
 def lead_exists(contact):
     """Check if a lead with the same contact number already exists."""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT 1 FROM leads WHERE contact_number = %s LIMIT 1", (contact,))
+            cur.execute(_backend.LEAD_EXISTS_SQL, (contact,))
             return cur.fetchone() is not None
 
+@metrics.instrument("db.existing_contact_digits")
+def existing_contact_digits(digits):
+    """Which of ``digits`` (canonical numbers, see normalize_contact) are already in leads.
+
+    One indexed lookup for the whole batch against leads.contact_digits
+    (migration 4), instead of a lead_exists() round trip per number.
+    """
+    digits = sorted(set(digits) - {""})
+    if not digits:
+        return set()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            return _backend.existing_contact_digits(cur, digits)
+
+
+@metrics.instrument("db.insert_lead")
 def insert_lead(name, contact, address, source, status,
                 first_contacted=None, notes=None, licence="unknown", scheduled_walk_in=None):
     try:
         with get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    """
-                    INSERT INTO leads 
-                    (name, contact_number, address, source, status, first_contacted, notes, licence, scheduled_walk_in)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
+                    _backend.INSERT_LEAD_SQL,
                     (
                         name, contact, address, source, status,
                         first_contacted if first_contacted else None,
@@ -104,10 +497,10 @@ def insert_lead(name, contact, address, source, status,
                     )
                 )
             conn.commit()
-        st.cache_data.clear()
+        invalidate_lead_cache()
         return True
 
-    except psycopg2.errors.UniqueViolation:
+    except _UNIQUE_VIOLATION:
         # Duplicate caught at DB level
         st.warning("⚠️ A lead with this contact number already exists!")
         return False
@@ -116,6 +509,141 @@ def insert_lead(name, contact, address, source, status,
         st.error(f"❌ Error inserting lead: {e}")
         return False
 
+# --- Search ---
+SEARCH_LIMIT = 50
+
+
+def _has_trigram_search():
+    """Whether pg_trgm is installed (migration 3 skips it where unavailable); never with SQLite."""
+    return _backend.has_trigram_search()
+
+
+@metrics.instrument("db.search_leads")
+def search_leads(term, filters=None, limit=SEARCH_LIMIT):
+    """Ranked search over name, contact number, address and notes.
+
+    Words match by prefix through the full-text vector (name, address,
+    notes), and digits match the normalized contact number, so "+91 98765"
+    finds "98765 43210". With pg_trgm installed, substrings anywhere in
+    name/address/notes/contact and typos in the name (trigram similarity)
+    match too, still index-backed. ``filters`` narrows the result like
+    query_leads, archive scope included. Needs migration 4. SQLite matches
+    substrings with LIKE instead.
+    """
+    term = (term or "").strip()
+    if not term:
+        return pd.DataFrame()
+    with lead_cache.reading() as version:
+        return _search_leads(version, term, filters, limit)
+
+
+@st.cache_data(ttl=60, max_entries=200)
+@metrics.instrument("db.search_leads" + metrics.UNCACHED_SUFFIX)
+def _search_leads(version, term, filters, limit):
+    lead_cache.miss()
+    return _run_search(term, filters, limit)
+
+
+def _run_search(term, filters, limit):
+    return compact_leads(_backend.search(term, filters, limit))
+
+
+# --- Bulk insert ---
+def _contact_str(value):
+    # Excel hands numeric phone numbers over as floats (9876543210.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _lead_rows(df):
+    """Turn an upload DataFrame into INSERT-ready tuples (NaN -> None)."""
+    df = df.reindex(columns=LEAD_COLUMNS)
+    defaults = {"address": "", "notes": "", "status": "pending", "licence": "unknown"}
+    df = df.astype(object).where(df.notna(), None)
+    for column, default in defaults.items():
+        df[column] = df[column].where(df[column].notna(), default)
+    df["contact_number"] = df["contact_number"].map(_contact_str, na_action="ignore")
+    for column in ("first_contacted", "scheduled_walk_in"):
+        # each value parsed on its own: uploads mix "2024-01-05", "05/01/2024", "Jan 6 2024"
+        parsed = pd.to_datetime(df[column], errors="coerce", format="mixed")
+        df[column] = parsed.dt.date.astype(object).where(parsed.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+@metrics.instrument("db.bulk_insert_leads")
+def bulk_insert_leads(df, chunk_size=1000, clear_cache=True):
+    """Insert an upload DataFrame in chunks inside a single transaction.
+
+    Rows whose contact_number already exists (in the table or earlier in the
+    upload) are skipped via ON CONFLICT and reported as duplicates. If a chunk
+    hits any other error it is rolled back to a savepoint and retried row by
+    row so only the offending rows fail. The lead cache is cleared once.
+
+    Returns a dict with ``inserted``/``duplicates``/``failed`` counts, a
+    ``row_status`` Series aligned with ``df.index``, ``errors`` (index ->
+    message) for failed rows and per-chunk ``chunks`` timings.
+    """
+    rows = _lead_rows(df)
+    index = list(df.index)
+    row_status = pd.Series("inserted", index=df.index, dtype=object)
+    errors = {}
+    chunks = []
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for start in range(0, len(rows), chunk_size):
+                started = time.perf_counter()
+                chunk = rows[start:start + chunk_size]
+                chunk_index = index[start:start + chunk_size]
+
+                cur.execute("SAVEPOINT bulk_chunk")
+                try:
+                    inserted = _backend.insert_chunk(cur, chunk)
+                    failed = {}
+                except _DB_ERRORS:
+                    cur.execute("ROLLBACK TO SAVEPOINT bulk_chunk")
+                    inserted, failed = set(), {}
+                    for idx, row in zip(chunk_index, chunk):
+                        cur.execute("SAVEPOINT bulk_row")
+                        try:
+                            inserted |= _backend.insert_chunk(cur, [row])
+                        except _DB_ERRORS as e:
+                            cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                            failed[idx] = str(e).strip()
+                cur.execute("RELEASE SAVEPOINT bulk_chunk")
+
+                counts = {"inserted": 0, "duplicates": 0, "failed": len(failed)}
+                for idx, row in zip(chunk_index, chunk):
+                    if idx in failed:
+                        row_status[idx] = "failed"
+                    elif row[1] in inserted:
+                        # a contact repeated later in the upload is a duplicate
+                        inserted.discard(row[1])
+                        counts["inserted"] += 1
+                    else:
+                        row_status[idx] = "duplicate"
+                        counts["duplicates"] += 1
+                errors.update(failed)
+                chunks.append({
+                    "chunk": len(chunks) + 1,
+                    "rows": len(chunk),
+                    **counts,
+                    "seconds": round(time.perf_counter() - started, 4),
+                })
+    if clear_cache:
+        invalidate_lead_cache()
+
+    return {
+        "inserted": sum(c["inserted"] for c in chunks),
+        "duplicates": sum(c["duplicates"] for c in chunks),
+        "failed": sum(c["failed"] for c in chunks),
+        "row_status": row_status,
+        "errors": errors,
+        "chunks": chunks,
+    }
+
+@metrics.instrument("db.update_lead_status")
 def update_lead_status(
     lead_id,
     name,
@@ -130,42 +658,191 @@ def update_lead_status(
     licence = licence.lower() if licence else None
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT status FROM leads WHERE id=%s", (lead_id,))
-            row = cur.fetchone()
-            old_status = row[0] if row else None
-
-            cur.execute(
-                """
-                UPDATE leads
-                SET name=%s,
-                    contact_number=%s,
-                    source=%s,
-                    status=%s,
-                    first_contacted=%s,
-                    notes=%s,
-                    licence=%s,
-                    scheduled_walk_in=%s,
-                    updated_at=NOW()
-                WHERE id=%s
-                """,
-                (name, contact_number, source, status,
-                 first_contacted, notes, licence, scheduled_walk_in, lead_id)
+            # locks the row, updates it and records a status change in lead_history
+            _backend.update_lead(
+                cur,
+                {
+                    "lead_id": lead_id,
+                    "name": name,
+                    "contact_number": contact_number,
+                    "source": source,
+                    "status": status,
+                    "first_contacted": first_contacted,
+                    "notes": notes,
+                    "licence": licence,
+                    "scheduled_walk_in": scheduled_walk_in,
+                }
             )
-
-            if old_status and old_status != status:
-                cur.execute(
-                    """
-                    INSERT INTO lead_history (lead_id, old_status, new_status, changed_at, notes)
-                    VALUES (%s, %s, %s, NOW(), %s)
-                    """,
-                    (lead_id, old_status, status, notes)
-                )
         conn.commit()
-    st.cache_data.clear()
+    invalidate_lead_cache()
 
+@metrics.instrument("db.delete_lead")
 def delete_lead(lead_id):
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM leads WHERE id = %s", (lead_id,))
+            _backend.delete_leads(cur, [int(lead_id)])
         conn.commit()
-    st.cache_data.clear()
\ No newline at end of file
+    invalidate_lead_cache()
+
+# --- Batched edits (Manage Leads grid) ---
+def _none_if_na(value):
+    # data_editor rows carry NaN/NaT for empty cells (pandas 3 text columns too)
+    return None if value is None or pd.isna(value) else value
+
+
+def _date_or_none(value):
+    value = _none_if_na(value)
+    return None if value is None else pd.Timestamp(value).date()
+
+
+def _batch_update_rows(changes):
+    """(id, name, contact_number, source, status, first_contacted, notes, licence, scheduled_walk_in) tuples."""
+    rows = []
+    for c in changes:
+        c = {key: _none_if_na(value) for key, value in c.items()}
+        rows.append((
+            int(c["id"]), c["name"], c["contact_number"], c["source"], c["status"],
+            _date_or_none(c.get("first_contacted")), c.get("notes") or "",
+            c["licence"].lower() if c.get("licence") else None,
+            _date_or_none(c.get("scheduled_walk_in")),
+        ))
+    return rows
+
+
+@metrics.instrument("db.update_leads_batch")
+def update_leads_batch(changes):
+    """Apply many lead edits in one transaction.
+
+    ``changes`` is a list of dicts holding ``id`` plus the editable fields
+    (name, contact_number, source, status, first_contacted, notes, licence,
+    scheduled_walk_in). The rows are locked while their old statuses are
+    read, updated with a single UPDATE ... FROM (VALUES ...), and every
+    status change is written to lead_history in one INSERT. Returns the
+    number of history rows written.
+    """
+    if not changes:
+        return 0
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            written = _backend.apply_lead_edits(cur, _batch_update_rows(changes))
+    invalidate_lead_cache()
+    return written
+
+
+@metrics.instrument("db.delete_leads")
+def delete_leads(lead_ids):
+    """Delete several leads in one statement."""
+    lead_ids = [int(i) for i in lead_ids]
+    if not lead_ids:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            _backend.delete_leads(cur, lead_ids)
+    invalidate_lead_cache()
+
+
+@metrics.instrument("db.save_lead_edits")
+def save_lead_edits(changes, delete_ids):
+    """update_leads_batch() and delete_leads() in one transaction, for the Manage Leads grid.
+
+    Returns False, saving nothing, when an edit gives a lead a contact
+    number another lead already has.
+    """
+    delete_ids = [int(i) for i in delete_ids]
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                if changes:
+                    _backend.apply_lead_edits(cur, _batch_update_rows(changes))
+                if delete_ids:
+                    _backend.delete_leads(cur, delete_ids)
+    except _UNIQUE_VIOLATION:
+        st.error("❌ Another lead already has one of these contact numbers. Nothing was saved.")
+        return False
+    invalidate_lead_cache()
+    return True
+
+
+# --- Mass status change ---
+@metrics.instrument("db.set_leads_status")
+def set_leads_status(lead_ids, status, notes=""):
+    """Move several leads to ``status``; returns how many changed.
+
+    Leads already in that status are left alone, so running the same call
+    twice (a resumed job) changes nothing the second time.
+    """
+    lead_ids = [int(i) for i in lead_ids]
+    if not lead_ids:
+        return 0
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            # locks the rows and records each change in lead_history
+            changed = _backend.set_status(cur, lead_ids, status, notes)
+    invalidate_lead_cache()
+    return changed
+
+
+# --- Archive ---
+# Leads in a closed status that nobody has touched for ARCHIVE_AFTER_DAYS
+# move to leads_archive (migration 6), keeping their id and history, so the
+# hot table, the lead cache and every default query only carry open work.
+# The closed statuses are lead_queries.CLOSED_STATUSES.
+ARCHIVE_BATCH_ROWS = 1000
+# lead_history is partitioned by month; archive.py keeps this many months of
+# partitions ready ahead so new rows never land in the default partition
+HISTORY_PARTITION_MONTHS_AHEAD = 3
+
+
+@metrics.instrument("db.archive_closed_leads")
+def archive_closed_leads(older_than_days=ARCHIVE_AFTER_DAYS, batch_rows=ARCHIVE_BATCH_ROWS):
+    """Move one batch of due closed leads into leads_archive; returns their ids.
+
+    Each call is its own short transaction, so archive.py can run batch after
+    batch next to the app without holding locks for long; fewer than
+    ``batch_rows`` ids means nothing else is due. The archived leads drop
+    out of the rollups behind facets and into archive_daily_counts, which
+    the dashboard still counts. Their contact numbers can come back as new
+    leads.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            ids = _backend.archive_batch(cur, archive_cutoff(older_than_days), batch_rows)
+    if ids:
+        invalidate_lead_cache()
+    return ids
+
+
+def prune_daily_counts():
+    """Drop lead_daily_counts buckets emptied by archiving, so the rollup reads stay small; returns how many."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM lead_daily_counts WHERE lead_count = 0")
+            return cur.rowcount
+
+
+def get_archive_stats(older_than_days=ARCHIVE_AFTER_DAYS):
+    """Live, archived and due-for-archive lead counts."""
+    statuses = ", ".join(f":closed{i}" for i in range(len(CLOSED_STATUSES)))
+    row = pd.read_sql(
+        text(f"""
+            SELECT (SELECT COUNT(*) FROM leads) AS live,
+                   (SELECT COUNT(*) FROM leads_archive) AS archived,
+                   (SELECT COUNT(*) FROM leads WHERE status IN ({statuses}) AND updated_at < :cutoff) AS due
+        """),
+        engine,
+        params={
+            "cutoff": archive_cutoff(older_than_days),
+            **{f"closed{i}": status for i, status in enumerate(CLOSED_STATUSES)},
+        },
+    ).iloc[0]
+    return {key: int(value) for key, value in row.items()}
+
+
+def add_history_partitions(months_ahead=HISTORY_PARTITION_MONTHS_AHEAD):
+    """Create lead_history's monthly partitions up to ``months_ahead`` months out; returns how many were added."""
+    return _backend.add_history_partitions(months_ahead)
+
+
+def get_history_partitions():
+    """lead_history's partitions with their bounds and row estimates, oldest first."""
+    return _backend.history_partitions()
@@ -0,0 +1,362 @@
+"""PostgreSQL backend for db.py (the default).
+
+db.py keeps the public functions (connections, caches, invalidation,
+metrics) and hands the SQL that only PostgreSQL understands to this
+backend: full-text/trigram search, = ANY(array) lookups, FOR UPDATE
+locking, named-cursor exports and lead_history's partitions. The schema
+is managed by migrations.py; init_schema() applies any pending migrations
+when db.py is imported. db_sqlite.SQLiteBackend has the same
+interface for the embedded backend.
+"""
+import re
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+import metrics
+from lead_queries import (
+    ALL_DAILY_COUNTS, CLOSED_STATUSES, LEAD_COLUMNS, LEAD_SELECT_COLUMNS, MIN_CONTACT_DIGITS, PHONE_TERM,
+    build_lead_where, lead_source, like_pattern, status_changes, where,
+)
+from validation import contact_search_digits
+
+# matches taken from each search branch before ranking
+SEARCH_CANDIDATES = 500
+
+_BULK_INSERT_SQL = f"""
+    INSERT INTO leads ({", ".join(LEAD_COLUMNS)}, updated_at)
+    VALUES %s
+    ON CONFLICT (contact_number) DO NOTHING
+    RETURNING contact_number
+"""
+# updated_at stamps the last write (archive.py ages closed leads by it)
+_BULK_INSERT_TEMPLATE = "(" + ", ".join(["%s"] * len(LEAD_COLUMNS)) + ", NOW())"
+
+# One round trip: lock the row and read its old status, update it, and
+# record a status change. Concurrent editors queue on the row lock, so each
+# history row sees the status the previous one wrote.
+_UPDATE_LEAD_SQL = """
+    WITH old AS (
+        SELECT id, status FROM leads WHERE id = %(lead_id)s FOR UPDATE
+    ),
+    updated AS (
+        UPDATE leads
+        SET name=%(name)s,
+            contact_number=%(contact_number)s,
+            source=%(source)s,
+            status=%(status)s,
+            first_contacted=%(first_contacted)s,
+            notes=%(notes)s,
+            licence=%(licence)s,
+            scheduled_walk_in=%(scheduled_walk_in)s,
+            updated_at=NOW()
+        FROM old
+        WHERE leads.id = old.id
+        RETURNING leads.id, old.status AS old_status, leads.status AS new_status
+    )
+    INSERT INTO lead_history (lead_id, old_status, new_status, changed_at, notes)
+    SELECT id, old_status, new_status, NOW(), %(notes)s
+    FROM updated
+    WHERE old_status IS NOT NULL AND old_status <> new_status
+"""
+
+# --- Batched edits (Manage Leads grid) ---
+_BATCH_UPDATE_SQL = """
+    UPDATE leads AS l
+    SET name = v.name,
+        contact_number = v.contact_number,
+        source = v.source,
+        status = v.status,
+        first_contacted = v.first_contacted,
+        notes = v.notes,
+        licence = v.licence,
+        scheduled_walk_in = v.scheduled_walk_in,
+        updated_at = NOW()
+    FROM (VALUES %s) AS v (
+        id, name, contact_number, source, status,
+        first_contacted, notes, licence, scheduled_walk_in
+    )
+    WHERE l.id = v.id
+"""
+# VALUES rows carry no column types: cast every column so NULLs and
+# Python floats never make PostgreSQL guess one
+_BATCH_UPDATE_TEMPLATE = (
+    "(%s::int, %s::text, %s::text, %s::text, %s::text, %s::date, %s::text, %s::text, %s::date)"
+)
+
+# --- Mass status change ---
+# Lock the rows and read their old statuses, update the ones that differ,
+# and record each change in lead_history, all in one statement
+_SET_STATUS_SQL = """
+    WITH old AS (
+        SELECT id, status FROM leads WHERE id = ANY(%(ids)s) FOR UPDATE
+    ),
+    updated AS (
+        UPDATE leads
+        SET status = %(status)s, updated_at = NOW()
+        FROM old
+        WHERE leads.id = old.id AND old.status IS DISTINCT FROM %(status)s
+        RETURNING leads.id, old.status AS old_status
+    )
+    INSERT INTO lead_history (lead_id, old_status, new_status, changed_at, notes)
+    SELECT id, old_status, %(status)s, NOW(), %(notes)s
+    FROM updated
+    WHERE old_status IS NOT NULL
+"""
+
+# --- Archive ---
+# One round trip per batch: lock due rows (skipping any an editor holds),
+# delete them from leads and insert what the DELETE returned into the archive
+_ARCHIVE_BATCH_SQL = f"""
+    WITH batch AS (
+        SELECT id FROM leads
+        WHERE status = ANY(%(statuses)s) AND updated_at < %(cutoff)s
+        LIMIT %(batch_rows)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        DELETE FROM leads USING batch
+        WHERE leads.id = batch.id
+        RETURNING leads.*
+    )
+    INSERT INTO leads_archive ({LEAD_SELECT_COLUMNS})
+    SELECT {LEAD_SELECT_COLUMNS} FROM moved
+    RETURNING id
+"""
+
+
+def _prefix_tsquery(term):
+    """'ravi kum' -> 'ravi:* & kum:*' so partially typed words match."""
+    words = re.findall(r"\w+", term)
+    return " & ".join(f"{word}:*" for word in words) or None
+
+
+class PostgresBackend:
+    """The SQL db.py runs against PostgreSQL, on ``engine``'s pool."""
+
+    # Driver errors the write paths catch
+    DB_ERRORS = (psycopg2.Error,)
+    UNIQUE_VIOLATION = psycopg2.errors.UniqueViolation
+
+    # what the lead queries use from either table, search columns included
+    ARCHIVE_SCOPE_COLUMNS = LEAD_SELECT_COLUMNS + ", contact_digits, search_vector"
+
+    INSERT_LEAD_SQL = """
+        INSERT INTO leads
+        (name, contact_number, address, source, status, first_contacted, notes, licence, scheduled_walk_in, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+    """
+    LEAD_EXISTS_SQL = "SELECT 1 FROM leads WHERE contact_number = %s LIMIT 1"
+
+    # Lead intake per week (starting Monday) by status, from %(days)s days before this week
+    WEEKLY_COUNTS_SQL = f"""
+        SELECT date_trunc('week', day)::date AS week, NULLIF(status, '') AS status, SUM(lead_count) AS leads
+        FROM {ALL_DAILY_COUNTS}
+        WHERE day >= date_trunc('week', CURRENT_DATE)::date - %(days)s
+        GROUP BY 1, 2
+        HAVING SUM(lead_count) > 0
+        ORDER BY 1
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._trigram = None
+
+    def init_schema(self):
+        """Apply the migrations (migrations.py) this database has not had yet.
+
+        An up-to-date database costs one query. If applying fails (e.g. the
+        app's role may not run DDL) the app refuses to start rather than
+        run against a schema its queries don't match.
+        """
+        import migrations  # imports db, which is importing this module
+
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+                applied = set()
+                if cur.fetchone()[0]:
+                    cur.execute("SELECT version FROM schema_migrations")
+                    applied = {row[0] for row in cur.fetchall()}
+        pending = [version for version, _, _ in migrations.MIGRATIONS if version not in applied]
+        if not pending:
+            return
+        try:
+            migrations.migrate(self.connection)
+        except self.DB_ERRORS as exc:
+            raise RuntimeError(
+                f"The database is missing schema migrations {pending} and applying them failed ({exc}). "
+                "Run `python migrations.py` as the schema owner, then restart."
+            ) from exc
+
+    @contextmanager
+    def connection(self):
+        """Check a DBAPI connection out of the pool; see db.get_connection()."""
+        with metrics.timed("db.connect"):
+            conn = self.engine.raw_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            if self.engine.dialect.is_disconnect(e, conn.dbapi_connection, None):
+                conn.invalidate(e)
+            else:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # --- Reads ---
+    def read_sql(self, sql, params=None):
+        return pd.read_sql(sql, self.engine, params=params)
+
+    def iter_lead_rows(self, sql, params, batch_rows):
+        """Batches of ``sql``'s rows from a server-side (named) cursor."""
+        with self.connection() as conn:
+            with conn.cursor(name="lead_export") as cur:
+                cur.itersize = batch_rows
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(batch_rows)
+                    if not rows:
+                        break
+                    yield rows
+
+    # --- Search ---
+    def has_trigram_search(self):
+        """Whether pg_trgm is installed (migration 3 skips it where unavailable)."""
+        if self._trigram is None:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    self._trigram = cur.fetchone() is not None
+        return self._trigram
+
+    def search(self, term, filters, limit):
+        digits = contact_search_digits(term)
+        has_digits = len(digits) >= MIN_CONTACT_DIGITS
+        params = {
+            "q": term,
+            "prefix_q": _prefix_tsquery(term),
+            "like": like_pattern(term),
+            "digits_prefix": f"{digits}%",
+            "digits_like": f"%{digits}%" if has_digits else None,
+            "candidates": SEARCH_CANDIDATES,
+            "limit": int(limit),
+        }
+        filter_clauses, filter_params = build_lead_where(filters)
+        params.update(filter_params)
+        source = lead_source(filters, self.ARCHIVE_SCOPE_COLUMNS)
+
+        # Each branch is index-backed (GIN on search_vector, btree prefix on
+        # contact_digits, GIN trigram when pg_trgm is installed) and capped, so
+        # ranking touches at most a few thousand rows however common the term.
+        branches = []
+        if params["prefix_q"] and not PHONE_TERM.match(term):
+            branches.append("search_vector @@ to_tsquery('simple', %(prefix_q)s)")
+        if has_digits:
+            branches.append("contact_digits LIKE %(digits_prefix)s")
+        if self.has_trigram_search():
+            # %% is pg_trgm's similarity operator, escaped for the driver
+            fuzzy = ["name ILIKE %(like)s", "address ILIKE %(like)s", "notes ILIKE %(like)s", "name %% %(q)s"]
+            if has_digits:
+                fuzzy.append("contact_digits LIKE %(digits_like)s")
+            branches.append("(" + " OR ".join(fuzzy) + ")")
+        if not branches:
+            return pd.DataFrame()
+
+        candidates = " UNION ".join(
+            f"(SELECT id FROM {source}{where([match] + filter_clauses)} LIMIT %(candidates)s)"
+            for match in branches
+        )
+        rank = [
+            "COALESCE(ts_rank(search_vector, to_tsquery('simple', %(prefix_q)s)), 0)",
+            "CASE WHEN contact_digits LIKE %(digits_like)s THEN 1 ELSE 0 END",
+            "CASE WHEN name ILIKE %(like)s THEN 0.5 ELSE 0 END",
+        ]
+        if self.has_trigram_search():
+            rank.append("similarity(name, %(q)s)")
+
+        sql = f"""
+            WITH candidates AS ({candidates})
+            SELECT {LEAD_SELECT_COLUMNS}, {" + ".join(rank)} AS rank
+            FROM {source} JOIN candidates USING (id)
+            ORDER BY rank DESC, id DESC
+            LIMIT %(limit)s
+        """
+        return self.read_sql(sql, params)
+
+    # --- Writes (on a cursor from connection()) ---
+    def existing_contact_digits(self, cur, digits):
+        cur.execute("SELECT DISTINCT contact_digits FROM leads WHERE contact_digits = ANY(%s)", (digits,))
+        return {row[0] for row in cur.fetchall()}
+
+    def insert_chunk(self, cur, rows):
+        """Insert one chunk; return the set of contact numbers actually inserted."""
+        inserted = execute_values(
+            cur, _BULK_INSERT_SQL, rows, template=_BULK_INSERT_TEMPLATE, page_size=len(rows), fetch=True
+        )
+        return {r[0] for r in inserted}
+
+    def update_lead(self, cur, fields):
+        """Update one lead from ``fields`` (lead_id plus the columns) and record a status change."""
+        cur.execute(_UPDATE_LEAD_SQL, fields)
+
+    def apply_lead_edits(self, cur, rows):
+        """Write db._batch_update_rows() ``rows`` and their status history; returns how many history rows."""
+        ids = [row[0] for row in rows]
+        cur.execute("SELECT id, status FROM leads WHERE id = ANY(%s) FOR UPDATE", (ids,))
+        old_status = dict(cur.fetchall())
+
+        execute_values(cur, _BATCH_UPDATE_SQL, rows, template=_BATCH_UPDATE_TEMPLATE, page_size=len(rows))
+
+        history = status_changes(rows, old_status)
+        if history:
+            execute_values(
+                cur,
+                "INSERT INTO lead_history (lead_id, old_status, new_status, changed_at, notes) VALUES %s",
+                history,
+                template="(%s, %s, %s, NOW(), %s)",
+                page_size=len(history),
+            )
+        return len(history)
+
+    def delete_leads(self, cur, lead_ids):
+        cur.execute("DELETE FROM leads WHERE id = ANY(%s)", (lead_ids,))
+
+    def set_status(self, cur, lead_ids, status, notes):
+        cur.execute(_SET_STATUS_SQL, {"ids": lead_ids, "status": status, "notes": notes})
+        return cur.rowcount
+
+    def archive_batch(self, cur, cutoff, batch_rows):
+        cur.execute(_ARCHIVE_BATCH_SQL, {
+            "statuses": CLOSED_STATUSES,
+            "cutoff": cutoff,
+            "batch_rows": int(batch_rows),
+        })
+        return [row[0] for row in cur.fetchall()]
+
+    # --- lead_history partitions ---
+    def add_history_partitions(self, months_ahead):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT lead_history_add_partitions("
+                    "CURRENT_DATE, (CURRENT_DATE + make_interval(months => %s))::date)",
+                    (int(months_ahead),),
+                )
+                return cur.fetchone()[0]
+
+    def history_partitions(self):
+        return self.read_sql(
+            """
+            SELECT c.relname AS partition, pg_get_expr(c.relpartbound, c.oid) AS bounds,
+                   c.reltuples::bigint AS rows_estimate
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'lead_history'::regclass
+            ORDER BY c.relname
+            """
+        )
@@ -0,0 +1,536 @@
+"""Embedded SQLite backend for db.py (DB_BACKEND=sqlite, or a sqlite:// DATABASE_URL).
+
+SQLiteBackend has db_postgres.PostgresBackend's interface, so db.py's
+functions run unchanged on either. The schema (leads, lead_history,
+leads_archive, jobs and the rollup tables behind facets and the dashboard)
+is created by init_schema(), which db.py calls on import.
+
+Search matches substrings with LIKE instead of full-text/trigram indexes,
+which is fine at local-development sizes. lead_history is a plain table
+here: SQLite has no partitioning. migrations.py stays
+PostgreSQL-only.
+"""
+import re
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import date, datetime, timezone
+
+import pandas as pd
+from sqlalchemy import event
+
+import metrics
+from lead_queries import (
+    ALL_DAILY_COUNTS, CLOSED_STATUSES, LEAD_COLUMNS, LEAD_SELECT_COLUMNS, MIN_CONTACT_DIGITS, PHONE_TERM,
+    build_lead_where, lead_source, like_pattern, status_changes, where,
+)
+from validation import contact_search_digits
+
+# Timestamps are stored as UTC text in this format, which sorts and compares
+# correctly as a string; dates as ISO "YYYY-MM-DD"
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _adapt_datetime(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(sep=" ", timespec="milliseconds")
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(pd.Timestamp, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+
+
+def _on_sqlite_connect(dbapi_connection, connection_record):
+    # no implicit transactions: connection() begins them explicitly
+    dbapi_connection.isolation_level = None
+    dbapi_connection.execute("PRAGMA journal_mode = WAL")  # readers don't block the writer
+    dbapi_connection.execute("PRAGMA busy_timeout = 5000")
+
+
+# --- Schema ---
+_SCHEMA_SQL = f"""
+    CREATE TABLE IF NOT EXISTS leads (
+        id                INTEGER PRIMARY KEY AUTOINCREMENT,
+        name              TEXT NOT NULL,
+        contact_number    TEXT NOT NULL UNIQUE,
+        address           TEXT,
+        source            TEXT,
+        status            TEXT NOT NULL DEFAULT 'pending',
+        first_contacted   DATE,
+        notes             TEXT,
+        licence           TEXT,
+        scheduled_walk_in DATE,
+        created_at        TIMESTAMP NOT NULL DEFAULT ({_NOW}),
+        updated_at        TIMESTAMP NOT NULL DEFAULT ({_NOW}),
+        -- last 10 digits, like the PostgreSQL column (no regexp_replace here)
+        contact_digits    TEXT GENERATED ALWAYS AS (substr(
+            replace(replace(replace(replace(replace(replace(
+                contact_number, ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', ''), -10
+        )) STORED
+    );
+    CREATE INDEX IF NOT EXISTS leads_status_id_idx ON leads (status, id);
+    CREATE INDEX IF NOT EXISTS leads_source_id_idx ON leads (source, id);
+    CREATE INDEX IF NOT EXISTS leads_licence_id_idx ON leads (licence, id);
+    CREATE INDEX IF NOT EXISTS leads_first_contacted_idx ON leads (first_contacted);
+    CREATE INDEX IF NOT EXISTS leads_scheduled_walk_in_idx ON leads (scheduled_walk_in);
+    CREATE INDEX IF NOT EXISTS leads_updated_at_idx ON leads (updated_at);
+    CREATE INDEX IF NOT EXISTS leads_contact_digits_idx ON leads (contact_digits);
+    CREATE INDEX IF NOT EXISTS leads_status_updated_at_idx ON leads (status, updated_at);
+
+    -- closed leads moved out by archive.py, as in migration 6
+    CREATE TABLE IF NOT EXISTS leads_archive (
+        id                INTEGER PRIMARY KEY,
+        name              TEXT NOT NULL,
+        contact_number    TEXT NOT NULL,
+        address           TEXT,
+        source            TEXT,
+        status            TEXT NOT NULL,
+        first_contacted   DATE,
+        notes             TEXT,
+        licence           TEXT,
+        scheduled_walk_in DATE,
+        created_at        TIMESTAMP NOT NULL,
+        updated_at        TIMESTAMP NOT NULL,
+        archived_at       TIMESTAMP NOT NULL DEFAULT ({_NOW}),
+        contact_digits    TEXT GENERATED ALWAYS AS (substr(
+            replace(replace(replace(replace(replace(replace(
+                contact_number, ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', ''), -10
+        )) STORED
+    );
+    CREATE INDEX IF NOT EXISTS leads_archive_status_id_idx ON leads_archive (status, id);
+    CREATE INDEX IF NOT EXISTS leads_archive_contact_digits_idx ON leads_archive (contact_digits);
+
+    -- history outlives the move to the archive, so no foreign key to leads;
+    -- the leads_drop_history triggers below stand in for ON DELETE CASCADE
+    CREATE TABLE IF NOT EXISTS lead_history (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        lead_id    INTEGER NOT NULL,
+        old_status TEXT,
+        new_status TEXT,
+        changed_at TIMESTAMP NOT NULL DEFAULT ({_NOW}),
+        notes      TEXT
+    );
+    CREATE INDEX IF NOT EXISTS lead_history_lead_id_idx ON lead_history (lead_id, changed_at);
+    CREATE INDEX IF NOT EXISTS lead_history_changed_at_idx ON lead_history (changed_at);
+
+    -- rollups, as in migration 5; row-level triggers keep them current
+    CREATE TABLE IF NOT EXISTS lead_daily_counts (
+        day        DATE NOT NULL,
+        status     TEXT NOT NULL,
+        source     TEXT NOT NULL,
+        lead_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, status, source)
+    );
+    CREATE TABLE IF NOT EXISTS archive_daily_counts (
+        day        DATE NOT NULL,
+        status     TEXT NOT NULL,
+        source     TEXT NOT NULL,
+        lead_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, status, source)
+    );
+    CREATE TABLE IF NOT EXISTS lead_transition_stats (
+        old_status    TEXT NOT NULL,
+        new_status    TEXT NOT NULL,
+        transitions   INTEGER NOT NULL DEFAULT 0,
+        total_seconds REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (old_status, new_status)
+    );
+
+    CREATE TRIGGER IF NOT EXISTS leads_daily_counts_insert AFTER INSERT ON leads
+    BEGIN
+        INSERT INTO lead_daily_counts (day, status, source, lead_count)
+        VALUES (date(NEW.created_at), coalesce(NEW.status, ''), coalesce(NEW.source, ''), 1)
+        ON CONFLICT (day, status, source) DO UPDATE SET lead_count = lead_count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS leads_daily_counts_delete AFTER DELETE ON leads
+    BEGIN
+        UPDATE lead_daily_counts SET lead_count = lead_count - 1
+        WHERE day = date(OLD.created_at) AND status = coalesce(OLD.status, '')
+          AND source = coalesce(OLD.source, '');
+    END;
+    CREATE TRIGGER IF NOT EXISTS leads_daily_counts_update AFTER UPDATE OF status, source ON leads
+    WHEN OLD.status IS NOT NEW.status OR OLD.source IS NOT NEW.source
+    BEGIN
+        UPDATE lead_daily_counts SET lead_count = lead_count - 1
+        WHERE day = date(OLD.created_at) AND status = coalesce(OLD.status, '')
+          AND source = coalesce(OLD.source, '');
+        INSERT INTO lead_daily_counts (day, status, source, lead_count)
+        VALUES (date(NEW.created_at), coalesce(NEW.status, ''), coalesce(NEW.source, ''), 1)
+        ON CONFLICT (day, status, source) DO UPDATE SET lead_count = lead_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS lead_history_transition_stats AFTER INSERT ON lead_history
+    WHEN NEW.old_status IS NOT NULL AND NEW.new_status IS NOT NULL
+    BEGIN
+        INSERT INTO lead_transition_stats (old_status, new_status, transitions, total_seconds)
+        VALUES (
+            NEW.old_status, NEW.new_status, 1,
+            86400.0 * (julianday(NEW.changed_at) - julianday(coalesce(
+                (SELECT h.changed_at FROM lead_history h
+                 WHERE h.lead_id = NEW.lead_id AND h.id < NEW.id
+                 ORDER BY h.changed_at DESC, h.id DESC LIMIT 1),
+                (SELECT l.created_at FROM leads l WHERE l.id = NEW.lead_id)
+            )))
+        )
+        ON CONFLICT (old_status, new_status) DO UPDATE
+            SET transitions = transitions + 1, total_seconds = total_seconds + excluded.total_seconds;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS leads_archive_daily_counts_insert AFTER INSERT ON leads_archive
+    BEGIN
+        INSERT INTO archive_daily_counts (day, status, source, lead_count)
+        VALUES (date(NEW.created_at), coalesce(NEW.status, ''), coalesce(NEW.source, ''), 1)
+        ON CONFLICT (day, status, source) DO UPDATE SET lead_count = lead_count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS leads_archive_daily_counts_delete AFTER DELETE ON leads_archive
+    BEGIN
+        UPDATE archive_daily_counts SET lead_count = lead_count - 1
+        WHERE day = date(OLD.created_at) AND status = coalesce(OLD.status, '')
+          AND source = coalesce(OLD.source, '');
+    END;
+
+    -- a lead's history goes once the lead is in neither table; archiving
+    -- inserts into leads_archive before deleting from leads
+    CREATE TRIGGER IF NOT EXISTS leads_drop_history AFTER DELETE ON leads
+    WHEN NOT EXISTS (SELECT 1 FROM leads_archive WHERE id = OLD.id)
+    BEGIN
+        DELETE FROM lead_history WHERE lead_id = OLD.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS leads_archive_drop_history AFTER DELETE ON leads_archive
+    WHEN NOT EXISTS (SELECT 1 FROM leads WHERE id = OLD.id)
+    BEGIN
+        DELETE FROM lead_history WHERE lead_id = OLD.id;
+    END;
+
+    -- background jobs, as in migration 7
+    CREATE TABLE IF NOT EXISTS jobs (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind             TEXT NOT NULL,
+        status           TEXT NOT NULL DEFAULT 'queued',
+        params           TEXT NOT NULL,
+        checkpoint       TEXT,
+        result           TEXT,
+        error            TEXT,
+        done             INTEGER NOT NULL DEFAULT 0,
+        total            INTEGER,
+        cancel_requested BOOLEAN NOT NULL DEFAULT 0,
+        worker           TEXT,
+        attempts         INTEGER NOT NULL DEFAULT 0,
+        created_at       TIMESTAMP NOT NULL DEFAULT ({_NOW}),
+        started_at       TIMESTAMP,
+        heartbeat_at     TIMESTAMP,
+        finished_at      TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status_id_idx ON jobs (status, id);
+    CREATE INDEX IF NOT EXISTS jobs_kind_id_idx ON jobs (kind, id);
+"""
+
+# Databases created before leads_archive have lead_history REFERENCES leads
+# ON DELETE CASCADE, which would take history along with archived leads.
+# SQLite can't drop a foreign key, so the table is copied without it.
+_HISTORY_WITHOUT_FOREIGN_KEY_SQL = f"""
+    BEGIN IMMEDIATE;
+    CREATE TABLE lead_history_rebuilt (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        lead_id    INTEGER NOT NULL,
+        old_status TEXT,
+        new_status TEXT,
+        changed_at TIMESTAMP NOT NULL DEFAULT ({_NOW}),
+        notes      TEXT
+    );
+    INSERT INTO lead_history_rebuilt (id, lead_id, old_status, new_status, changed_at, notes)
+    SELECT id, lead_id, old_status, new_status, changed_at, notes FROM lead_history;
+    DROP TABLE lead_history;
+    ALTER TABLE lead_history_rebuilt RENAME TO lead_history;
+    COMMIT;
+"""
+
+
+# --- Connections ---
+class _Connection:
+    """sqlite3 connection whose cursors are context managers, like psycopg2's."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return closing(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# lead_queries' SQL is written for psycopg2: %(name)s placeholders and ILIKE
+_PYFORMAT = re.compile(r"%\((\w+)\)s")
+
+
+def _named(sql):
+    """Translate the shared filter/paging SQL to sqlite3 named parameters."""
+    sql = re.sub(r"ILIKE (%\(\w+\)s)", r"LIKE \1 ESCAPE '\\'", sql)
+    return _PYFORMAT.sub(r":\1", sql)
+
+
+_EXPORT_COLUMNS = [column.strip() for column in LEAD_SELECT_COLUMNS.split(",")]
+_DATE_POSITIONS = [_EXPORT_COLUMNS.index(c) for c in ("first_contacted", "scheduled_walk_in")]
+_TIMESTAMP_POSITIONS = [_EXPORT_COLUMNS.index(c) for c in ("created_at", "updated_at")]
+
+
+def _typed_row(row):
+    # stored as text; hand exports real dates/datetimes like psycopg2 does
+    row = list(row)
+    for i in _DATE_POSITIONS:
+        if row[i]:
+            row[i] = date.fromisoformat(row[i])
+    for i in _TIMESTAMP_POSITIONS:
+        if row[i]:
+            row[i] = datetime.fromisoformat(row[i]).replace(tzinfo=timezone.utc)
+    return tuple(row)
+
+
+_ROW_PLACEHOLDERS = "(" + ", ".join(["?"] * len(LEAD_COLUMNS)) + f", {_NOW})"
+_HISTORY_INSERT_SQL = (
+    f"INSERT INTO lead_history (lead_id, old_status, new_status, changed_at, notes) VALUES (?, ?, ?, {_NOW}, ?)"
+)
+
+
+def _in_list(ids):
+    return "(" + ", ".join(["?"] * len(ids)) + ")"
+
+
+# stays under SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds
+_IN_LIST_MAX = 900
+
+
+def _batches(values):
+    for start in range(0, len(values), _IN_LIST_MAX):
+        yield values[start:start + _IN_LIST_MAX]
+
+
+class SQLiteBackend:
+    """db.py's SQL for SQLite, on ``engine``'s pool."""
+
+    DB_ERRORS = (sqlite3.Error,)
+    UNIQUE_VIOLATION = sqlite3.IntegrityError
+
+    # no search_vector column here; search matches with LIKE
+    ARCHIVE_SCOPE_COLUMNS = LEAD_SELECT_COLUMNS + ", contact_digits"
+
+    INSERT_LEAD_SQL = f"""
+        INSERT INTO leads
+        (name, contact_number, address, source, status, first_contacted, notes, licence, scheduled_walk_in, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {_NOW})
+    """
+    LEAD_EXISTS_SQL = "SELECT 1 FROM leads WHERE contact_number = ? LIMIT 1"
+
+    WEEKLY_COUNTS_SQL = f"""
+        SELECT date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days') AS week,
+               NULLIF(status, '') AS status, SUM(lead_count) AS leads
+        FROM {ALL_DAILY_COUNTS}
+        WHERE day >= date('now', '-6 days', 'weekday 1', '-' || %(days)s || ' days')
+        GROUP BY 1, 2
+        HAVING SUM(lead_count) > 0
+        ORDER BY 1
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        if not event.contains(engine, "connect", _on_sqlite_connect):
+            event.listen(engine, "connect", _on_sqlite_connect)
+
+    def init_schema(self):
+        """Create the tables, indexes and rollup triggers if they don't exist."""
+        conn = self.engine.raw_connection()
+        try:
+            sqlite_conn = conn.dbapi_connection
+            if sqlite_conn.execute("PRAGMA foreign_key_list(lead_history)").fetchall():
+                # before _SCHEMA_SQL, whose triggers would point at the old table
+                sqlite_conn.executescript(_HISTORY_WITHOUT_FOREIGN_KEY_SQL)
+            sqlite_conn.executescript(_SCHEMA_SQL)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """One IMMEDIATE transaction per block.
+
+        IMMEDIATE takes the write lock up front, so read-then-write paths (old
+        status -> history) are serialized the way FOR UPDATE does it in PostgreSQL.
+        """
+        with metrics.timed("db.connect"):
+            conn = self.engine.raw_connection()
+        try:
+            conn.cursor().execute("BEGIN IMMEDIATE")
+            yield _Connection(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # --- Reads ---
+    def read_sql(self, sql, params=None):
+        return pd.read_sql(_named(sql), self.engine, params=params)
+
+    def iter_lead_rows(self, sql, params, batch_rows):
+        """Batches of ``sql``'s rows; a plain cursor already streams them."""
+        conn = self.engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(_named(sql), params)
+            while True:
+                rows = cur.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield [_typed_row(row) for row in rows]
+        finally:
+            conn.close()
+
+    # --- Search ---
+    def has_trigram_search(self):
+        return False
+
+    def search(self, term, filters, limit):
+        """Substring search over name/address/notes and the contact digits, ranked like PostgreSQL's."""
+        digits = contact_search_digits(term)
+        has_digits = len(digits) >= MIN_CONTACT_DIGITS
+        words = re.findall(r"\w+", term)
+        params = {
+            "like": like_pattern(term),
+            "name_prefix": like_pattern(term)[1:],
+            "digits_prefix": f"{digits}%",
+            "digits_like": f"%{digits}%",
+            "limit": int(limit),
+        }
+
+        branches = []
+        if words and not PHONE_TERM.match(term):
+            # every word must appear somewhere in name, address or notes
+            word_clauses = []
+            for i, word in enumerate(words):
+                params[f"w{i}"] = like_pattern(word)
+                word_clauses.append(
+                    f"(name ILIKE %(w{i})s OR address ILIKE %(w{i})s OR notes ILIKE %(w{i})s)"
+                )
+            branches.append("(" + " AND ".join(word_clauses) + ")")
+        if has_digits:
+            branches.append("contact_digits LIKE %(digits_like)s")
+        if not branches:
+            return pd.DataFrame()
+
+        filter_clauses, filter_params = build_lead_where(filters)
+        params.update(filter_params)
+        rank = " + ".join([
+            "CASE WHEN contact_digits LIKE %(digits_prefix)s THEN 1 ELSE 0 END" if has_digits else "0",
+            "CASE WHEN name ILIKE %(name_prefix)s THEN 1 ELSE 0 END",
+            "CASE WHEN name ILIKE %(like)s THEN 0.5 ELSE 0 END",
+        ])
+        sql = f"""
+            SELECT {LEAD_SELECT_COLUMNS}, {rank} AS rank
+            FROM {lead_source(filters, self.ARCHIVE_SCOPE_COLUMNS)}
+            {where(["(" + " OR ".join(branches) + ")"] + filter_clauses)}
+            ORDER BY rank DESC, id DESC
+            LIMIT %(limit)s
+        """
+        return self.read_sql(sql, params)
+
+    # --- Writes (on a cursor from connection()) ---
+    def existing_contact_digits(self, cur, digits):
+        """IN lists instead of = ANY(array)."""
+        found = set()
+        for batch in _batches(digits):
+            cur.execute(f"SELECT DISTINCT contact_digits FROM leads WHERE contact_digits IN {_in_list(batch)}", batch)
+            found.update(row[0] for row in cur.fetchall())
+        return found
+
+    def insert_chunk(self, cur, rows):
+        """Insert one chunk; return the set of contact numbers actually inserted."""
+        cur.execute(
+            f"""
+            INSERT INTO leads ({", ".join(LEAD_COLUMNS)}, updated_at)
+            VALUES {", ".join([_ROW_PLACEHOLDERS] * len(rows))}
+            ON CONFLICT (contact_number) DO NOTHING
+            RETURNING contact_number
+            """,
+            [value for row in rows for value in row],
+        )
+        return {r[0] for r in cur.fetchall()}
+
+    def update_lead(self, cur, fields):
+        """Update one lead from ``fields`` (lead_id plus the columns) and record a status change."""
+        cur.execute("SELECT status FROM leads WHERE id = :lead_id", fields)
+        old = cur.fetchone()
+        cur.execute(
+            f"""
+            UPDATE leads
+            SET name=:name, contact_number=:contact_number, source=:source, status=:status,
+                first_contacted=:first_contacted, notes=:notes, licence=:licence,
+                scheduled_walk_in=:scheduled_walk_in, updated_at={_NOW}
+            WHERE id=:lead_id
+            """,
+            fields,
+        )
+        if old and old[0] and old[0] != fields["status"]:
+            cur.execute(_HISTORY_INSERT_SQL, (fields["lead_id"], old[0], fields["status"], fields["notes"]))
+
+    def apply_lead_edits(self, cur, rows):
+        """The PostgreSQL edits, applied with executemany."""
+        old_status = {}
+        for batch in _batches([row[0] for row in rows]):
+            cur.execute(f"SELECT id, status FROM leads WHERE id IN {_in_list(batch)}", batch)
+            old_status.update(cur.fetchall())
+        cur.executemany(
+            f"""
+            UPDATE leads
+            SET name=?, contact_number=?, source=?, status=?, first_contacted=?,
+                notes=?, licence=?, scheduled_walk_in=?, updated_at={_NOW}
+            WHERE id=?
+            """,
+            [row[1:] + row[:1] for row in rows],
+        )
+        history = status_changes(rows, old_status)
+        cur.executemany(_HISTORY_INSERT_SQL, history)
+        return len(history)
+
+    def delete_leads(self, cur, lead_ids):
+        for batch in _batches(lead_ids):
+            cur.execute(f"DELETE FROM leads WHERE id IN {_in_list(batch)}", batch)
+
+    def set_status(self, cur, lead_ids, status, notes):
+        """Read the old statuses, then update and record the ones that differ."""
+        changed = 0
+        for batch in _batches(lead_ids):
+            cur.execute(f"SELECT id, status FROM leads WHERE id IN {_in_list(batch)}", batch)
+            moved = [(lead_id, old) for lead_id, old in cur.fetchall() if old != status]
+            cur.executemany(
+                f"UPDATE leads SET status = ?, updated_at = {_NOW} WHERE id = ?",
+                [(status, lead_id) for lead_id, _ in moved],
+            )
+            cur.executemany(_HISTORY_INSERT_SQL, [(lead_id, old, status, notes) for lead_id, old in moved if old])
+            changed += len(moved)
+        return changed
+
+    def archive_batch(self, cur, cutoff, batch_rows):
+        """Copy the batch into leads_archive, then delete it from leads."""
+        cur.execute(
+            f"SELECT id FROM leads WHERE status IN {_in_list(CLOSED_STATUSES)} AND updated_at < ? LIMIT ?",
+            [*CLOSED_STATUSES, cutoff, int(batch_rows)],
+        )
+        ids = [row[0] for row in cur.fetchall()]
+        for batch in _batches(ids):
+            cur.execute(
+                f"INSERT INTO leads_archive ({LEAD_SELECT_COLUMNS}) "
+                f"SELECT {LEAD_SELECT_COLUMNS} FROM leads WHERE id IN {_in_list(batch)}",
+                batch,
+            )
+            cur.execute(f"DELETE FROM leads WHERE id IN {_in_list(batch)}", batch)
+        return ids
+
+    # --- lead_history partitions ---
+    def add_history_partitions(self, months_ahead):
+        """No partitions in SQLite; lead_history is one table."""
+        return 0
+
+    def history_partitions(self):
+        return pd.DataFrame(columns=["partition", "bounds", "rows_estimate"])
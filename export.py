@@ -0,0 +1,125 @@
+import csv
+import io
+
+import streamlit as st
+
+import metrics
+from db import LEAD_SELECT_COLUMNS, iter_leads
+
+EXPORT_COLUMNS = [column.strip() for column in LEAD_SELECT_COLUMNS.split(",")]
+
+# format key -> (button label, file extension, MIME type)
+EXPORT_FORMATS = {
+    "xlsx": ("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "csv", "text/csv"),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet"),
+}
+
+TEMPLATE_COLUMNS = [
+    "name", "contact_number", "address", "source", "status",
+    "first_contacted", "licence", "scheduled_walk_in", "notes"
+]
+
+# Excel's hard limit, header row included
+XLSX_MAX_ROWS = 1_048_576
+
+
+def _write_xlsx(path, batches):
+    import xlsxwriter
+
+    # constant_memory flushes each row to disk once the next one starts,
+    # so the workbook never holds more than a row in memory
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd",
+        "remove_timezone": True,
+    })
+    sheet, row_num, sheets = None, XLSX_MAX_ROWS, 0
+    for rows in batches:
+        for row in rows:
+            if row_num == XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.add_worksheet("Leads" if sheets == 1 else f"Leads ({sheets})")
+                sheet.write_row(0, 0, EXPORT_COLUMNS)
+                row_num = 1
+            sheet.write_row(row_num, 0, row)
+            row_num += 1
+    if sheet is None:
+        workbook.add_worksheet("Leads").write_row(0, 0, EXPORT_COLUMNS)
+    workbook.close()
+
+
+def _write_csv(path, batches):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in batches:
+            writer.writerows(rows)
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        "id": pa.int64(),
+        "first_contacted": pa.date32(),
+        "scheduled_walk_in": pa.date32(),
+        "created_at": pa.timestamp("us", tz="UTC"),
+        "updated_at": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS])
+
+
+def _write_parquet(path, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+        # ParquetWriter always writes the schema, so an empty result is still a valid file
+
+
+_WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv, "parquet": _write_parquet}
+
+
+def _counted(batches, on_progress):
+    written = 0
+    for rows in batches:
+        yield rows
+        written += len(rows)
+        on_progress(written)
+
+
+@metrics.instrument("export.write_export")
+def write_export(path, filters=None, fmt="xlsx", on_progress=None):
+    """Stream every lead matching ``filters`` into a file at ``path``.
+
+    Rows are read in batches from a server-side cursor and written straight
+    to the file. ``on_progress(rows_written)`` is called after each batch.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    batches = iter_leads(filters)
+    try:
+        _WRITERS[fmt](path, _counted(batches, on_progress) if on_progress else batches)
+    finally:
+        # returns the cursor's connection to the pool even if a writer failed
+        batches.close()
+
+
+@st.cache_resource
+def upload_template():
+    """The empty upload template workbook, built once per process."""
+    import xlsxwriter
+
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
+    workbook.add_worksheet("Leads_Template").write_row(0, 0, TEMPLATE_COLUMNS)
+    workbook.close()
+    return output.getvalue()
@@ -0,0 +1,170 @@
+import pandas as pd
+
+import metrics
+from db import bulk_insert_leads, existing_contact_digits, invalidate_lead_cache
+from validation import normalize_contacts, validate_leads
+
+CHUNK_ROWS = 5000
+PREVIEW_ROWS = 200
+
+
+def _iter_csv(uploaded_file, chunk_rows):
+    size = getattr(uploaded_file, "size", None)
+    # keep phone numbers as text: no float coercion, leading zeros survive
+    reader = pd.read_csv(uploaded_file, chunksize=chunk_rows, dtype={"contact_number": str})
+    for chunk in reader:
+        yield chunk, min(uploaded_file.tell() / size, 1.0) if size else None
+
+
+def _iter_xlsx(uploaded_file, chunk_rows):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        total = sheet.max_row
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else f"column_{i}" for i, c in enumerate(next(rows, ()))]
+        batch, start, seen = [], 0, 1
+        for row in rows:
+            seen += 1
+            if all(value is None for value in row):
+                continue
+            batch.append(row[:len(header)])
+            if len(batch) == chunk_rows:
+                frame = pd.DataFrame(batch, columns=header, index=range(start, start + len(batch)))
+                yield frame, min(seen / total, 1.0) if total else None
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch))), 1.0
+    finally:
+        workbook.close()
+
+
+def iter_upload_chunks(uploaded_file, chunk_rows=CHUNK_ROWS):
+    """Yield ``(chunk DataFrame, fraction of file read)`` for a CSV/XLSX upload.
+
+    CSV is read with pandas in fixed-size chunks, XLSX through openpyxl's
+    read-only row iterator, so only one chunk is materialised at a time.
+    The fraction is None when the size is unknown.
+    """
+    uploaded_file.seek(0)
+    if uploaded_file.name.lower().endswith(".csv"):
+        yield from _iter_csv(uploaded_file, chunk_rows)
+    else:
+        yield from _iter_xlsx(uploaded_file, chunk_rows)
+
+
+# values of the "duplicate" column; invalid rows are left blank
+NEW = "new"
+IN_FILE = "duplicate in file"
+IN_DATABASE = "already in database"
+
+
+def flag_duplicates(chunk, seen):
+    """Add a "duplicate" column to a validated chunk: NEW, IN_FILE or IN_DATABASE.
+
+    Valid rows are keyed by their canonical contact number, so numbers that
+    differ only in formatting ("+91 98765 43210", "09876543210") collide.
+    ``seen`` holds the keys of earlier chunks and is updated in place; keys
+    new to the file are checked against the database in a single query.
+    """
+    valid = chunk["is_valid"]
+    # uploads without the column have only invalid rows (validate_leads flags them)
+    contacts = chunk.get("contact_number", pd.Series(None, index=chunk.index, dtype=object))
+    keys = normalize_contacts(contacts)
+    keyed = valid & keys.ne("")
+    keys = keys.where(keyed)
+    in_file = keyed & (keys.duplicated() | keys.isin(list(seen)))
+    candidates = keys[keyed & ~in_file]
+    existing = existing_contact_digits(candidates)
+    in_database = chunk.index.isin(candidates.index[candidates.isin(list(existing))])
+    seen.update(candidates)
+
+    chunk["duplicate"] = None
+    chunk.loc[valid, "duplicate"] = NEW
+    chunk.loc[in_file, "duplicate"] = IN_FILE
+    chunk.loc[in_database, "duplicate"] = IN_DATABASE
+    return chunk
+
+
+def _append_bounded(preview, frame, limit):
+    room = limit - sum(len(f) for f in preview)
+    if room > 0 and not frame.empty:
+        preview.append(frame.head(room))
+
+
+@metrics.instrument("ingest.ingest_upload")
+def ingest_upload(uploaded_file, insert=False, on_progress=None,
+                  chunk_rows=CHUNK_ROWS, preview_rows=PREVIEW_ROWS, resume=None):
+    """Stream an upload through validation (and optionally bulk insert).
+
+    Each chunk is validated, its valid rows are flagged by flag_duplicates()
+    and, with ``insert=True``, the new ones are inserted before the next
+    chunk is read; flagged duplicates are skipped and counted in
+    ``duplicates``. Only counters and bounded previews (first rows, invalid
+    rows, duplicates, failed inserts) are kept, so memory stays flat however
+    large the file is. ``on_progress(fraction, summary)`` is called after
+    every chunk.
+
+    ``resume`` is a summary passed to an earlier on_progress call: its
+    ``chunks_done`` chunks are skipped and its counters carried on (the
+    background jobs in jobs.py resume this way). Numbers repeated in the
+    skipped chunks then count as already in the database.
+    """
+    summary = {
+        "rows": 0, "valid": 0, "invalid": 0, "new": 0,
+        "in_file_duplicates": 0, "db_duplicates": 0,
+        "inserted": 0, "duplicates": 0, "failed": 0,
+        "chunks": [], "chunks_done": 0,
+    }
+    if resume:
+        summary.update(resume)
+    preview, invalid_preview, duplicate_preview, failed_preview = [], [], [], []
+    seen = set()
+
+    for index, (chunk, fraction) in enumerate(iter_upload_chunks(uploaded_file, chunk_rows)):
+        if index < summary["chunks_done"]:
+            continue
+        with metrics.timed("ingest.validate_chunk"):
+            validate_leads(chunk)
+        with metrics.timed("ingest.flag_duplicates"):
+            flag_duplicates(chunk, seen)
+        valid = chunk["is_valid"]
+        new = chunk["duplicate"] == NEW
+        summary["rows"] += len(chunk)
+        summary["valid"] += int(valid.sum())
+        summary["invalid"] += int((~valid).sum())
+        summary["new"] += int(new.sum())
+        summary["in_file_duplicates"] += int((chunk["duplicate"] == IN_FILE).sum())
+        summary["db_duplicates"] += int((chunk["duplicate"] == IN_DATABASE).sum())
+        _append_bounded(preview, chunk, preview_rows)
+        _append_bounded(invalid_preview, chunk[~valid], preview_rows)
+        _append_bounded(duplicate_preview, chunk[valid & ~new], preview_rows)
+
+        if insert:
+            summary["duplicates"] += int((valid & ~new).sum())
+        if insert and new.any():
+            result = bulk_insert_leads(chunk[new], clear_cache=False)
+            for key in ("inserted", "duplicates", "failed"):
+                summary[key] += result[key]
+            for timing in result["chunks"]:
+                summary["chunks"].append({**timing, "chunk": len(summary["chunks"]) + 1})
+            if result["errors"]:
+                failed = chunk.loc[list(result["errors"])].copy()
+                failed["errors"] = pd.Series(result["errors"])
+                _append_bounded(failed_preview, failed, preview_rows)
+
+        summary["chunks_done"] += 1
+        if on_progress:
+            on_progress(fraction, summary)
+
+    if insert:
+        invalidate_lead_cache()
+
+    summary["preview"] = pd.concat(preview) if preview else pd.DataFrame()
+    summary["invalid_preview"] = pd.concat(invalid_preview) if invalid_preview else pd.DataFrame()
+    summary["duplicate_preview"] = pd.concat(duplicate_preview) if duplicate_preview else pd.DataFrame()
+    summary["failed_preview"] = pd.concat(failed_preview) if failed_preview else pd.DataFrame()
+    return summary
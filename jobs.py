@@ -0,0 +1,438 @@
+"""Background jobs for long bulk operations: uploads, exports, mass status changes.
+
+    python jobs.py                 # run a worker in the foreground (Ctrl-C to stop)
+    python jobs.py --workers 4
+    python jobs.py --list          # recent jobs and their progress
+
+Jobs live in the jobs table (migration 7), so they outlive the browser tab
+that submitted them and the process that ran them. submit() queues one; a
+JobRunner claims queued jobs and runs them on a thread pool. The app starts
+a runner inside the Streamlit server (JOBS_IN_APP, JOB_WORKERS); with
+JOBS_IN_APP=0 run one or more `python jobs.py` workers instead.
+
+A handler works chunk by chunk and saves a checkpoint (JSON) after each
+one. While a job runs, its runner refreshes heartbeat_at; a running job
+whose heartbeat is older than STALE_AFTER (its worker died or restarted)
+is claimed again and its handler resumes from the last checkpoint. Each
+chunk is idempotent (uploads skip numbers already in the database, status
+changes skip leads already in the status), so redoing the chunk in flight
+at a crash does no harm. Exports are rewritten from the start: a file is
+only usable once complete. Finished export files are deleted EXPORT_KEEP
+after they were written.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+import db
+import metrics
+
+logger = logging.getLogger("leadtracker.jobs")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+HEARTBEAT_SECONDS = 10
+STALE_AFTER = timedelta(seconds=60)
+POLL_SECONDS = 1.0
+# leads per mass status change transaction
+STATUS_CHUNK_ROWS = 1000
+# finished export files are deleted once this old (checked whenever an export runs)
+EXPORT_KEEP = timedelta(hours=24)
+
+
+class JobCancelled(Exception):
+    """Raised from JobContext.checkpoint() once cancel_job() was called."""
+
+
+class JobLost(Exception):
+    """Raised from JobContext.checkpoint() when another worker has claimed the job."""
+
+
+# --- JSON (params, checkpoints, results) ---
+# filters carry dates; numpy scalars come from pandas
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return {"__date__": value.isoformat()}
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json_hook(obj):
+    if "__date__" in obj:
+        value = obj["__date__"]
+        return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    return obj
+
+
+def _dumps(value):
+    return None if value is None else json.dumps(value, default=_json_default)
+
+
+def _loads(value):
+    return None if value is None else json.loads(value, object_hook=_json_hook)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+# --- Store ---
+# Plain SQL through SQLAlchemy, so the same statements run on PostgreSQL and
+# SQLite; each call is one statement and so one transaction.
+_JOB_COLUMNS = (
+    "id, kind, status, params, checkpoint, result, error, done, total, cancel_requested, "
+    "worker, attempts, created_at, started_at, heartbeat_at, finished_at"
+)
+
+
+def _execute(sql, **params):
+    with db.engine.begin() as conn:
+        result = conn.execute(text(sql), params)
+        return result.mappings().all() if result.returns_rows else []
+
+
+def _job(row):
+    job = dict(row)
+    for key in ("params", "checkpoint", "result"):
+        job[key] = _loads(job[key])
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def submit(kind, **params):
+    """Queue a job of ``kind`` (see HANDLERS) with JSON-able ``params``; returns its id."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    rows = _execute(
+        "INSERT INTO jobs (kind, status, params, created_at) VALUES (:kind, :status, :params, :now) RETURNING id",
+        kind=kind, status=QUEUED, params=_dumps(params), now=_now(),
+    )
+    return rows[0]["id"]
+
+
+def get_job(job_id):
+    rows = _execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = :id", id=int(job_id))
+    return _job(rows[0]) if rows else None
+
+
+def list_jobs(kind=None, limit=20):
+    """The newest jobs, of one ``kind`` or all, as dicts."""
+    where = "WHERE kind = :kind " if kind else ""
+    rows = _execute(f"SELECT {_JOB_COLUMNS} FROM jobs {where}ORDER BY id DESC LIMIT :limit", kind=kind, limit=limit)
+    return [_job(row) for row in rows]
+
+
+def cancel_job(job_id):
+    """Cancel a queued job now, or ask a running one to stop after its current chunk."""
+    _execute(
+        """
+        UPDATE jobs
+        SET cancel_requested = :yes,
+            status = CASE WHEN status = :queued THEN :cancelled ELSE status END,
+            finished_at = CASE WHEN status = :queued THEN :now ELSE finished_at END
+        WHERE id = :id AND status IN (:queued, :running)
+        """,
+        id=int(job_id), yes=True, queued=QUEUED, running=RUNNING, cancelled=CANCELLED, now=_now(),
+    )
+
+
+# The subquery picks a candidate; the outer WHERE repeats the condition so
+# that when two workers pick the same one, the second updates nothing.
+_CLAIM_CONDITION = "(status = :queued OR (status = :running AND heartbeat_at < :stale_before))"
+_CLAIM_SQL = f"""
+    UPDATE jobs
+    SET status = :running, worker = :worker, attempts = attempts + 1,
+        started_at = COALESCE(started_at, :now), heartbeat_at = :now
+    WHERE id = (SELECT id FROM jobs WHERE {_CLAIM_CONDITION} ORDER BY id LIMIT 1)
+      AND {_CLAIM_CONDITION}
+    RETURNING {_JOB_COLUMNS}
+"""
+
+
+def claim_job(worker):
+    """Take the oldest queued job, or a running one whose worker stopped heartbeating."""
+    now = _now()
+    rows = _execute(
+        _CLAIM_SQL,
+        queued=QUEUED, running=RUNNING, worker=worker, now=now, stale_before=now - STALE_AFTER,
+    )
+    return _job(rows[0]) if rows else None
+
+
+def _heartbeat(job_ids, worker):
+    if job_ids:
+        ids = ", ".join(str(int(i)) for i in job_ids)
+        _execute(
+            f"UPDATE jobs SET heartbeat_at = :now WHERE id IN ({ids}) AND worker = :worker AND status = :running",
+            now=_now(), worker=worker, running=RUNNING,
+        )
+
+
+def _finish(job_id, worker, status, result=None, error=None):
+    _execute(
+        """
+        UPDATE jobs SET status = :status, result = :result, error = :error, finished_at = :now
+        WHERE id = :id AND worker = :worker
+        """,
+        id=job_id, worker=worker, status=status, result=_dumps(result), error=error, now=_now(),
+    )
+
+
+class JobContext:
+    """What a handler gets: the job's params, its last checkpoint, and checkpoint() to save progress."""
+
+    def __init__(self, job, worker):
+        self.id = job["id"]
+        self.params = job["params"]
+        self.state = job["checkpoint"]
+        self._worker = worker
+
+    def checkpoint(self, state, done, total=None):
+        """Save ``state`` (where a resumed run picks up) and progress; stop if cancelled or reclaimed."""
+        rows = _execute(
+            """
+            UPDATE jobs SET checkpoint = :state, done = :done, total = :total, heartbeat_at = :now
+            WHERE id = :id AND worker = :worker AND status = :running
+            RETURNING cancel_requested
+            """,
+            id=self.id, worker=self._worker, running=RUNNING,
+            state=_dumps(state), done=int(done), total=None if total is None else int(total), now=_now(),
+        )
+        if not rows:
+            raise JobLost(f"job {self.id} was claimed by another worker")
+        if rows[0]["cancel_requested"]:
+            raise JobCancelled()
+        self.state = state
+
+
+# --- Handlers ---
+# kind -> fn(ctx) returning the job's JSON-able result
+class _SpooledUpload(io.FileIO):
+    """An upload saved to JOBS_DIR, with the .name/.size ingest_upload reads."""
+
+    @property
+    def size(self):
+        return os.fstat(self.fileno()).st_size
+
+
+def submit_upload(uploaded_file):
+    """Save an upload to JOBS_DIR and queue a job that validates and inserts it."""
+    os.makedirs(db.JOBS_DIR, exist_ok=True)
+    # keeps the extension: ingest picks the reader by it
+    path = os.path.join(db.JOBS_DIR, f"upload-{uuid.uuid4().hex[:12]}-{os.path.basename(uploaded_file.name)}")
+    uploaded_file.seek(0)
+    with open(path, "wb") as f:
+        while block := uploaded_file.read(1 << 20):
+            f.write(block)
+    return submit("upload", path=path, name=uploaded_file.name)
+
+
+def _run_upload(ctx):
+    from ingest import ingest_upload
+
+    def on_progress(fraction, summary):
+        # per-batch insert timings are left out: they only grow
+        state = {key: value for key, value in summary.items() if key != "chunks"}
+        ctx.checkpoint(state, done=summary["rows"], total=round(summary["rows"] / fraction) if fraction else None)
+
+    path = ctx.params["path"]
+    try:
+        with _SpooledUpload(path) as upload:
+            summary = ingest_upload(upload, insert=True, on_progress=on_progress, resume=ctx.state)
+    except JobLost:
+        raise  # the worker that took it over still needs the file
+    except Exception:
+        os.remove(path)
+        raise
+    os.remove(path)
+    failed = summary["failed_preview"]
+    return {
+        **{key: summary[key] for key in (
+            "rows", "valid", "invalid", "new", "in_file_duplicates", "db_duplicates",
+            "inserted", "duplicates", "failed",
+        )},
+        "failed_preview": json.loads(failed.to_json(orient="records", date_format="iso")) if len(failed) else [],
+    }
+
+
+def _prune_exports():
+    cutoff = time.time() - EXPORT_KEEP.total_seconds()
+    for entry in os.scandir(db.JOBS_DIR):
+        if entry.name.startswith("export-") and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+
+
+def _run_export(ctx):
+    from export import EXPORT_FORMATS, write_export
+
+    filters, fmt = ctx.params["filters"], ctx.params["fmt"]
+    total = db.query_leads(filters, page_size=1)["total"]
+    os.makedirs(db.JOBS_DIR, exist_ok=True)
+    _prune_exports()
+    path = os.path.join(db.JOBS_DIR, f"export-{ctx.id}.{EXPORT_FORMATS[fmt][1]}")
+    ctx.checkpoint(None, done=0, total=total)
+    try:
+        write_export(path, filters, fmt, on_progress=lambda rows: ctx.checkpoint(None, done=rows, total=total))
+    except JobLost:
+        raise  # the worker that took it over is rewriting the file
+    except Exception:
+        # a partial file is of no use
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return {"path": path, "file_name": f"leads.{EXPORT_FORMATS[fmt][1]}", "bytes": os.path.getsize(path)}
+
+
+def _run_status_change(ctx):
+    state = ctx.state
+    if state is None:
+        # The checkpoint keeps the place by id rather than the matched ids
+        # themselves: leads are changed in id order up to the newest one that
+        # matched when the job first ran; leads added since are left alone.
+        first = db.query_leads(ctx.params["filters"], page_size=1)
+        newest = first["rows"]["id"]
+        state = {
+            "after_id": 0,
+            "last_id": int(newest.iloc[0]) if len(newest) else 0,
+            "total": first["total"],
+            "matched": 0,
+            "changed": 0,
+        }
+        ctx.checkpoint(state, done=0, total=state["total"])
+    while True:
+        chunk = db.get_lead_ids(ctx.params["filters"], after_id=state["after_id"], limit=STATUS_CHUNK_ROWS)
+        chunk = [lead_id for lead_id in chunk if lead_id <= state["last_id"]]
+        if not chunk:
+            break
+        changed = db.set_leads_status(chunk, ctx.params["status"], ctx.params.get("notes", ""))
+        state = {
+            **state,
+            "after_id": chunk[-1],
+            "matched": state["matched"] + len(chunk),
+            "changed": state["changed"] + changed,
+        }
+        ctx.checkpoint(state, done=state["matched"], total=state["total"])
+    return {"matched": state["matched"], "changed": state["changed"]}
+
+
+HANDLERS = {
+    "upload": _run_upload,
+    "export": _run_export,
+    "status_change": _run_status_change,
+}
+# kinds that change leads, so caches keyed on db.lead_cache.version go stale
+WRITING_KINDS = ("upload", "status_change")
+
+
+# --- Runner ---
+class JobRunner:
+    """Claims jobs from the table and runs up to ``workers`` of them on a thread pool.
+
+    A poller thread claims work whenever a slot is free and refreshes the
+    heartbeat of the jobs it is running every HEARTBEAT_SECONDS.
+    """
+
+    def __init__(self, workers=db.JOB_WORKERS, poll_seconds=POLL_SECONDS):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="job")
+        self._slots = threading.Semaphore(workers)
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, name="job-poller", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """Stop claiming jobs; with ``wait``, block until the running ones finish."""
+        self._stop.set()
+        self._thread.join()
+        self._pool.shutdown(wait=wait)
+
+    def running(self):
+        with self._lock:
+            return set(self._running)
+
+    def _poll(self):
+        last_beat = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_beat >= HEARTBEAT_SECONDS:
+                    _heartbeat(self.running(), self.worker)
+                    last_beat = time.monotonic()
+                if self._slots.acquire(blocking=False):
+                    job = claim_job(self.worker)
+                    if job is None:
+                        self._slots.release()
+                    else:
+                        with self._lock:
+                            self._running.add(job["id"])
+                        self._pool.submit(self._run, job)
+                        continue
+            except Exception:
+                # database unreachable for a moment: try again next poll
+                logger.exception("job poll failed")
+            self._stop.wait(self.poll_seconds)
+
+    def _run(self, job):
+        ctx = JobContext(job, self.worker)
+        try:
+            with metrics.timed(f"jobs.{job['kind']}"):
+                result = HANDLERS[job["kind"]](ctx)
+            _finish(job["id"], self.worker, SUCCEEDED, result=result)
+        except JobCancelled:
+            _finish(job["id"], self.worker, CANCELLED)
+        except JobLost:
+            logger.warning("job %s was taken over by another worker", job["id"])
+        except Exception as e:
+            logger.exception("job %s failed", job["id"])
+            _finish(job["id"], self.worker, FAILED, error=f"{type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(job["id"])
+            self._slots.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lead Tracker background job worker")
+    parser.add_argument("--workers", type=int, default=db.JOB_WORKERS, help="jobs run at once")
+    parser.add_argument("--list", action="store_true", help="show recent jobs and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for job in list_jobs(limit=50):
+            progress = f"{job['done']}/{job['total']}" if job["total"] else str(job["done"])
+            print(f"{job['id']:>6}  {job['kind']:<14} {job['status']:<10} {progress:>15}  {job['error'] or ''}")
+        return 0
+
+    logging.basicConfig(level=logging.INFO)
+    runner = JobRunner(args.workers).start()
+    print(f"worker {runner.worker} running up to {args.workers} jobs; Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        # running jobs stop heartbeating and are resumed by the next worker
+        runner.stop(wait=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import threading
+from contextlib import contextmanager
+
+
+class LeadCacheVersion:
+    """Process-wide version number that keys the lead query caches.
+
+    db.py's cached queries (st.cache_data) are called inside ``reading()``
+    and take its version as their first argument, so bumping the version
+    after a write makes every later call miss and read fresh rows, without
+    clearing st.cache_data app-wide. Old entries simply age out. The bodies
+    of those queries call ``miss()``, so stats() reports hits and misses.
+
+    db.py holds the one instance in st.cache_resource: a module reload must
+    not start the version at 0 again and hand out numbers that old cache
+    entries are keyed on.
+
+    The counter lives in one process. Writes made through db.py in this
+    process (the app, and the JobRunner threads it starts) bump it right
+    away. Writes from anywhere else (a `python jobs.py` worker with
+    JOBS_IN_APP=0, archive.py, another app server, psql) are not seen
+    until the cached entries expire, after at most their ttl (60 s); the
+    app also bumps the version when a job it is watching finishes, so its
+    own uploads and status changes show up at once wherever they ran.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"bumps": 0, "reads": 0, "misses": 0}
+
+    def bump(self):
+        """Record a write: later cached reads key on a new version."""
+        with self._lock:
+            self.version += 1
+            self._stats["bumps"] += 1
+
+    @contextmanager
+    def reading(self):
+        """Yield the version to key a cached read on; counts it as a hit unless miss() is called."""
+        with self._lock:
+            self._stats["reads"] += 1
+            version = self.version
+        self._local.reading = True
+        try:
+            yield version
+        finally:
+            self._local.reading = False
+
+    def miss(self):
+        """Called by a cached function's body: the read inside reading() had to query the database."""
+        # direct calls to the uncached functions (benchmarks) are not reads
+        if getattr(self._local, "reading", False):
+            with self._lock:
+                self._stats["misses"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {**self._stats, "version": self.version}
+        stats["hits"] = stats["reads"] - stats["misses"]
+        return stats
@@ -0,0 +1,138 @@
+"""Backend-neutral SQL building blocks for lead queries.
+
+Shared by db.py and the storage backends (db_postgres, db_sqlite), which
+import this module rather than db so there is no import cycle. SQL here
+uses psycopg2's %(name)s placeholders; the SQLite backend translates them.
+"""
+import re
+from datetime import timedelta
+
+import pandas as pd
+
+# Columns handed to the UI; leaves out the search-only generated columns
+LEAD_SELECT_COLUMNS = (
+    "id, name, contact_number, address, source, status, first_contacted, "
+    "notes, licence, scheduled_walk_in, created_at, updated_at"
+)
+
+# Columns an upload or insert writes
+LEAD_COLUMNS = [
+    "name", "contact_number", "address", "source", "status",
+    "first_contacted", "notes", "licence", "scheduled_walk_in"
+]
+
+# --- Filters ---
+# filter key -> (SQL condition, how to turn the filter value into named params)
+_DAY = timedelta(days=1)
+LEAD_FILTERS = {
+    "status": ("status = %(status)s", lambda v: {"status": v}),
+    "source": ("source = %(source)s", lambda v: {"source": v}),
+    "licence": ("licence = %(licence)s", lambda v: {"licence": v}),
+    # single day: half-open range so an index on the column stays usable
+    "first_contacted": (
+        "first_contacted >= %(first_contacted_from)s AND first_contacted < %(first_contacted_to)s",
+        lambda d: {"first_contacted_from": d, "first_contacted_to": d + _DAY},
+    ),
+    "scheduled_walk_in": (
+        "scheduled_walk_in >= %(walk_in_from)s AND scheduled_walk_in < %(walk_in_to)s",
+        lambda d: {"walk_in_from": d, "walk_in_to": d + _DAY},
+    ),
+    # inclusive date range (start, end)
+    "first_contacted_between": (
+        "first_contacted >= %(between_from)s AND first_contacted < %(between_to)s",
+        lambda r: {"between_from": r[0], "between_to": r[1] + _DAY},
+    ),
+    "search": (
+        "(name ILIKE %(search)s OR CAST(contact_number AS TEXT) ILIKE %(search)s)",
+        lambda term: {"search": like_pattern(term)},
+    ),
+}
+
+# sort key -> (ORDER BY direction on id, keyset comparison)
+LEAD_SORTS = {
+    "newest": ("DESC", "<"),
+    "oldest": ("ASC", ">"),
+}
+
+
+def like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# "archived" filter value -> the relation lead queries read. Without it only
+# live leads are read; archived ones (see archive.py) only when asked for.
+ARCHIVE_FILTER = "archived"
+_ARCHIVE_SCOPES = {
+    None: "leads",
+    "include": "(SELECT {columns} FROM leads UNION ALL SELECT {columns} FROM leads_archive) AS leads",
+    "only": "leads_archive AS leads",
+}
+
+
+def lead_source(filters, scope_columns):
+    """FROM target for ``filters``: leads, or leads_archive too when the "archived" filter asks.
+
+    ``scope_columns`` is what the backend's lead queries read from either
+    table, search columns included.
+    """
+    scope = (filters or {}).get(ARCHIVE_FILTER) or None
+    if scope not in _ARCHIVE_SCOPES:
+        raise ValueError(f"Unknown archive scope: {scope}")
+    return _ARCHIVE_SCOPES[scope].format(columns=scope_columns)
+
+
+def build_lead_where(filters):
+    """Turn a filters dict into SQL conditions and their named params.
+
+    Keys with a None/empty/"All" value are ignored, so UI state can be passed
+    through unchanged. The "archived" key picks the table (lead_source)
+    rather than adding a condition.
+    """
+    clauses, params = [], {}
+    for key, value in (filters or {}).items():
+        if key == ARCHIVE_FILTER or value is None or value == "" or value == "All":
+            continue
+        if key not in LEAD_FILTERS:
+            raise ValueError(f"Unknown lead filter: {key}")
+        clause, to_params = LEAD_FILTERS[key]
+        clauses.append(clause)
+        params.update(to_params(value))
+    return clauses, params
+
+
+def where(clauses):
+    return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+# --- Search ---
+# terms that are just a phone number skip the word branch
+PHONE_TERM = re.compile(r"^[\d\s()+\-.]+$")
+MIN_CONTACT_DIGITS = 3
+
+# --- Rollups ---
+# Daily counts of live and archived leads (migration 6); the funnel covers both
+ALL_DAILY_COUNTS = """(
+    SELECT day, status, source, lead_count FROM lead_daily_counts
+    UNION ALL
+    SELECT day, status, source, lead_count FROM archive_daily_counts
+) AS counts"""
+
+# --- Writes ---
+CLOSED_STATUSES = ["onboarded", "rejected"]
+
+
+def status_changes(rows, old_status):
+    """lead_history (lead_id, old_status, new_status, notes) rows for the edits that change status.
+
+    ``rows`` are db._batch_update_rows() tuples; ``old_status`` maps id -> status before the edit.
+    """
+    return [
+        (row[0], old_status[row[0]], row[4], row[6])
+        for row in rows
+        if old_status.get(row[0]) and old_status[row[0]] != row[4]
+    ]
+
+
+def archive_cutoff(older_than_days):
+    return pd.Timestamp.now(tz="UTC").to_pydatetime() - timedelta(days=int(older_than_days))
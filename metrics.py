@@ -0,0 +1,201 @@
+"""Timings, row/byte counts and cache hit rates for db.py calls and app renders.
+
+Off by default. With METRICS_ENABLED set, every instrumented call records
+its count, total and max seconds, rows and bytes returned; app.py shows the
+numbers in a debug sidebar, each call is logged as one JSON line on the
+"leadtracker.metrics" logger (at INFO), and with METRICS_PORT set they are
+served in Prometheus text format at http://<host>:<port>/metrics.
+
+When disabled, instrument() costs one flag check per call and timed()
+returns a shared no-op context manager.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+logger = logging.getLogger("leadtracker.metrics")
+
+# a cached op records its body as "<op>.uncached", which only runs on a cache miss
+UNCACHED_SUFFIX = ".uncached"
+
+_enabled = False
+_ops = {}
+_lock = threading.Lock()
+_sources = {}
+_server = None
+_NOOP = nullcontext()
+
+
+def configure(enabled=False, port=None):
+    """Turn collection on or off; start the /metrics endpoint once if ``port`` is given."""
+    global _enabled, _server
+    _enabled = bool(enabled)
+    if _enabled and port and _server is None:
+        from http.server import ThreadingHTTPServer
+
+        _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _metrics_handler())
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+
+
+def enabled():
+    return _enabled
+
+
+def add_source(name, stats):
+    """Register a callable returning a dict of numbers (e.g. db.get_pool_stats) to report as gauges."""
+    _sources[name] = stats
+
+
+def reset():
+    with _lock:
+        _ops.clear()
+
+
+# --- Recording ---
+def _size(result):
+    """(rows, bytes) of a DataFrame result or a page dict holding one (shallow bytes), or of a file."""
+    if isinstance(result, bytes):
+        return None, len(result)
+    if isinstance(result, dict):
+        result = result.get("rows")
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(index=False).sum())
+    return None, None
+
+
+def record(op, seconds, rows=None, nbytes=None):
+    with _lock:
+        stats = _ops.get(op)
+        if stats is None:
+            stats = _ops[op] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0, "bytes": 0}
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["rows"] += rows or 0
+        stats["bytes"] += nbytes or 0
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"op": op, "ms": round(seconds * 1000, 3), "rows": rows, "bytes": nbytes}))
+
+
+def instrument(op):
+    """Decorator: time each call of the function as ``op`` and count the rows it returns."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            record(op, time.perf_counter() - started, *_size(result))
+            return result
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def _timed(op):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(op, time.perf_counter() - started)
+
+
+def timed(op):
+    """Context manager timing a block (a render phase, a connection checkout) as ``op``."""
+    return _timed(op) if _enabled else _NOOP
+
+
+# --- Reading ---
+def snapshot():
+    """Per-op stats, cache hit/miss counts and the registered sources' numbers."""
+    with _lock:
+        ops = {op: dict(stats) for op, stats in _ops.items()}
+    caches = {}
+    for op, stats in ops.items():
+        body = ops.get(op + UNCACHED_SUFFIX)
+        if body is not None:
+            misses = body["calls"]
+            caches[op] = {"hits": max(stats["calls"] - misses, 0), "misses": misses}
+    sources = {}
+    for name, stats in _sources.items():
+        try:
+            sources[name] = {k: v for k, v in stats().items() if isinstance(v, (int, float))}
+        except Exception as e:
+            sources[name] = {"error": repr(e)}
+    return {"ops": ops, "caches": caches, "sources": sources}
+
+
+def ops_frame():
+    """snapshot()'s per-op stats as a DataFrame for the debug sidebar, slowest total first."""
+    ops = snapshot()["ops"]
+    if not ops:
+        return pd.DataFrame()
+    df = pd.DataFrame.from_dict(ops, orient="index").rename_axis("op").reset_index()
+    df["total_ms"] = df["seconds"] * 1000
+    df["avg_ms"] = df["total_ms"] / df["calls"]
+    df["max_ms"] = df["max_seconds"] * 1000
+    columns = ["op", "calls", "total_ms", "avg_ms", "max_ms", "rows", "bytes"]
+    return df[columns].sort_values("total_ms", ascending=False, ignore_index=True)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text():
+    """The current metrics in Prometheus text exposition format."""
+    snap = snapshot()
+    lines = [
+        "# TYPE leadtracker_op_seconds summary",
+        "# TYPE leadtracker_op_max_seconds gauge",
+        "# TYPE leadtracker_op_rows_total counter",
+        "# TYPE leadtracker_op_bytes_total counter",
+    ]
+    for op, stats in sorted(snap["ops"].items()):
+        label = f'{{op="{_label(op)}"}}'
+        lines += [
+            f"leadtracker_op_seconds_count{label} {stats['calls']}",
+            f"leadtracker_op_seconds_sum{label} {stats['seconds']:.6f}",
+            f"leadtracker_op_max_seconds{label} {stats['max_seconds']:.6f}",
+            f"leadtracker_op_rows_total{label} {stats['rows']}",
+            f"leadtracker_op_bytes_total{label} {stats['bytes']}",
+        ]
+    lines.append("# TYPE leadtracker_cache_requests_total counter")
+    for op, counts in sorted(snap["caches"].items()):
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            lines.append(f'leadtracker_cache_requests_total{{op="{_label(op)}",result="{result}"}} {counts[key]}')
+    lines.append("# TYPE leadtracker_source gauge")
+    for name, stats in sorted(snap["sources"].items()):
+        for key, value in sorted(stats.items()):
+            if isinstance(value, (int, float)):
+                lines.append(f'leadtracker_source{{source="{_label(name)}",stat="{_label(key)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def _metrics_handler():
+    # http.server is only imported when the endpoint is switched on
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # scrapes every few seconds; keep them out of the app's output
+            pass
+
+    return MetricsHandler
@@ -0,0 +1,608 @@
+"""Versioned schema migrations for the leads database.
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied / pending versions
+    python migrations.py --check    # EXPLAIN the main queries, fail if any can't use an index
+    python migrations.py --rebuild-rollups  # recompute the analytics rollups from scratch
+
+Each migration runs in its own transaction and is recorded in
+schema_migrations. Statements are idempotent (IF NOT EXISTS), so an existing
+database created by hand is adopted rather than rebuilt. Importing db also
+applies pending migrations (PostgresBackend.init_schema), so the app and
+workers never start on an old schema.
+"""
+import argparse
+import json
+import sys
+
+import db
+
+# Arbitrary key for pg_advisory_xact_lock so two app instances can't migrate at once
+_MIGRATION_LOCK_KEY = 7_351_204
+
+# Recomputes both rollups from scratch; used by migration 5
+ROLLUP_BACKFILL_SQL = """
+    DELETE FROM lead_daily_counts;
+    INSERT INTO lead_daily_counts (day, status, source, lead_count)
+    SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), count(*)
+    FROM leads GROUP BY 1, 2, 3;
+
+    DELETE FROM lead_transition_stats;
+    INSERT INTO lead_transition_stats (old_status, new_status, transitions, total_seconds)
+    SELECT old_status, new_status, count(*), sum(extract(epoch FROM changed_at - entered_at))
+    FROM (
+        SELECT h.old_status, h.new_status, h.changed_at,
+               coalesce(lag(h.changed_at) OVER (PARTITION BY h.lead_id ORDER BY h.changed_at, h.id),
+                        l.created_at) AS entered_at
+        FROM lead_history h
+        JOIN leads l ON l.id = h.lead_id
+    ) AS timed
+    WHERE old_status IS NOT NULL AND new_status IS NOT NULL
+    GROUP BY 1, 2;
+"""
+
+# rebuild_rollups() since migration 6: archived leads are counted in
+# archive_daily_counts, and their history still times its transitions
+ROLLUP_REBUILD_SQL = """
+    DELETE FROM lead_daily_counts;
+    INSERT INTO lead_daily_counts (day, status, source, lead_count)
+    SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), count(*)
+    FROM leads GROUP BY 1, 2, 3;
+
+    DELETE FROM archive_daily_counts;
+    INSERT INTO archive_daily_counts (day, status, source, lead_count)
+    SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), count(*)
+    FROM leads_archive GROUP BY 1, 2, 3;
+
+    DELETE FROM lead_transition_stats;
+    INSERT INTO lead_transition_stats (old_status, new_status, transitions, total_seconds)
+    SELECT old_status, new_status, count(*), sum(extract(epoch FROM changed_at - entered_at))
+    FROM (
+        SELECT h.old_status, h.new_status, h.changed_at,
+               coalesce(lag(h.changed_at) OVER (PARTITION BY h.lead_id ORDER BY h.changed_at, h.id),
+                        l.created_at) AS entered_at
+        FROM lead_history h
+        JOIN (
+            SELECT id, created_at FROM leads
+            UNION ALL
+            SELECT id, created_at FROM leads_archive
+        ) AS l ON l.id = h.lead_id
+    ) AS timed
+    WHERE old_status IS NOT NULL AND new_status IS NOT NULL
+    GROUP BY 1, 2;
+"""
+
+MIGRATIONS = [
+    (1, "create leads and lead_history", """
+        CREATE TABLE IF NOT EXISTS leads (
+            id                BIGSERIAL PRIMARY KEY,
+            name              TEXT NOT NULL,
+            contact_number    TEXT NOT NULL,
+            address           TEXT,
+            source            TEXT,
+            status            TEXT NOT NULL DEFAULT 'pending',
+            first_contacted   DATE,
+            notes             TEXT,
+            licence           TEXT,
+            scheduled_walk_in DATE,
+            created_at        TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at        TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        ALTER TABLE leads ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ DEFAULT NOW();
+        ALTER TABLE leads ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+        -- ON CONFLICT (contact_number) and lead_exists() rely on this
+        CREATE UNIQUE INDEX IF NOT EXISTS leads_contact_number_key ON leads (contact_number);
+
+        CREATE TABLE IF NOT EXISTS lead_history (
+            id         BIGSERIAL PRIMARY KEY,
+            lead_id    BIGINT NOT NULL REFERENCES leads (id) ON DELETE CASCADE,
+            old_status TEXT,
+            new_status TEXT,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            notes      TEXT
+        );
+    """),
+    (2, "b-tree indexes for lead filters and history", """
+        -- equality filter + ORDER BY id DESC keyset paging
+        CREATE INDEX IF NOT EXISTS leads_status_id_idx ON leads (status, id);
+        CREATE INDEX IF NOT EXISTS leads_source_id_idx ON leads (source, id);
+        CREATE INDEX IF NOT EXISTS leads_licence_id_idx ON leads (licence, id);
+        -- day / range filters
+        CREATE INDEX IF NOT EXISTS leads_first_contacted_idx ON leads (first_contacted);
+        CREATE INDEX IF NOT EXISTS leads_scheduled_walk_in_idx ON leads (scheduled_walk_in);
+        -- archive.py's due-for-archive scan
+        CREATE INDEX IF NOT EXISTS leads_updated_at_idx ON leads (updated_at);
+
+        CREATE INDEX IF NOT EXISTS lead_history_lead_id_idx ON lead_history (lead_id, changed_at);
+        CREATE INDEX IF NOT EXISTS lead_history_changed_at_idx ON lead_history (changed_at);
+    """),
+    (3, "trigram indexes for name/contact search", """
+        -- pg_trgm ships with most managed PostgreSQL (Supabase included);
+        -- skip quietly where it isn't installed so local servers still migrate
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                EXECUTE 'CREATE INDEX IF NOT EXISTS leads_name_trgm_idx '
+                        'ON leads USING gin (name gin_trgm_ops)';
+                EXECUTE 'CREATE INDEX IF NOT EXISTS leads_contact_number_trgm_idx '
+                        'ON leads USING gin (contact_number gin_trgm_ops)';
+            ELSE
+                RAISE NOTICE 'pg_trgm not available; ILIKE search will scan';
+            END IF;
+        END
+        $$;
+    """),
+    (4, "lead search: normalized contact digits and full-text vector", r"""
+        -- canonical phone digits; must match validation.normalize_contact()
+        ALTER TABLE leads ADD COLUMN IF NOT EXISTS contact_digits TEXT
+            GENERATED ALWAYS AS (right(regexp_replace(contact_number, '\D', '', 'g'), 10)) STORED;
+        ALTER TABLE leads ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('simple',
+                    coalesce(name, '') || ' ' || coalesce(address, '') || ' ' || coalesce(notes, ''))
+            ) STORED;
+        CREATE INDEX IF NOT EXISTS leads_search_vector_idx ON leads USING gin (search_vector);
+        CREATE INDEX IF NOT EXISTS leads_contact_digits_idx ON leads (contact_digits text_pattern_ops);
+
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+                EXECUTE 'CREATE INDEX IF NOT EXISTS leads_contact_digits_trgm_idx '
+                        'ON leads USING gin (contact_digits gin_trgm_ops)';
+                EXECUTE 'CREATE INDEX IF NOT EXISTS leads_address_trgm_idx '
+                        'ON leads USING gin (address gin_trgm_ops)';
+                EXECUTE 'CREATE INDEX IF NOT EXISTS leads_notes_trgm_idx '
+                        'ON leads USING gin (notes gin_trgm_ops)';
+            END IF;
+        END
+        $$;
+    """),
+    (5, "analytics rollups maintained by statement triggers", """
+        -- lead counts per creation day (UTC) / status / source; '' stands for NULL
+        CREATE TABLE IF NOT EXISTS lead_daily_counts (
+            day        DATE NOT NULL,
+            status     TEXT NOT NULL,
+            source     TEXT NOT NULL,
+            lead_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status, source)
+        );
+        -- status transitions and the time spent in the old status before each
+        CREATE TABLE IF NOT EXISTS lead_transition_stats (
+            old_status    TEXT NOT NULL,
+            new_status    TEXT NOT NULL,
+            transitions   BIGINT NOT NULL DEFAULT 0,
+            total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (old_status, new_status)
+        );
+
+        -- Statement-level triggers see every changed row at once through
+        -- transition tables, so a 10k-row bulk insert is one rollup upsert.
+        CREATE OR REPLACE FUNCTION lead_daily_counts_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO lead_daily_counts AS c (day, status, source, lead_count)
+                SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), count(*)
+                FROM new_rows GROUP BY 1, 2, 3
+                ON CONFLICT (day, status, source) DO UPDATE SET lead_count = c.lead_count + EXCLUDED.lead_count;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO lead_daily_counts AS c (day, status, source, lead_count)
+                SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), -count(*)
+                FROM old_rows GROUP BY 1, 2, 3
+                ON CONFLICT (day, status, source) DO UPDATE SET lead_count = c.lead_count + EXCLUDED.lead_count;
+            ELSE
+                -- only buckets whose count actually moved are touched
+                INSERT INTO lead_daily_counts AS c (day, status, source, lead_count)
+                SELECT day, status, source, sum(delta)
+                FROM (
+                    SELECT (created_at AT TIME ZONE 'UTC')::date AS day, coalesce(status, '') AS status,
+                           coalesce(source, '') AS source, -1 AS delta
+                    FROM old_rows
+                    UNION ALL
+                    SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), 1
+                    FROM new_rows
+                ) AS moved
+                GROUP BY 1, 2, 3
+                HAVING sum(delta) <> 0
+                ON CONFLICT (day, status, source) DO UPDATE SET lead_count = c.lead_count + EXCLUDED.lead_count;
+            END IF;
+            RETURN NULL;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS leads_daily_counts_insert ON leads;
+        CREATE TRIGGER leads_daily_counts_insert AFTER INSERT ON leads
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION lead_daily_counts_apply();
+        DROP TRIGGER IF EXISTS leads_daily_counts_update ON leads;
+        CREATE TRIGGER leads_daily_counts_update AFTER UPDATE ON leads
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION lead_daily_counts_apply();
+        DROP TRIGGER IF EXISTS leads_daily_counts_delete ON leads;
+        CREATE TRIGGER leads_daily_counts_delete AFTER DELETE ON leads
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION lead_daily_counts_apply();
+
+        -- Time in the old status runs from the lead's previous history row,
+        -- or from created_at for its first change. History of deleted leads
+        -- stays counted (stats are cumulative) until rebuild_rollups().
+        CREATE OR REPLACE FUNCTION lead_transition_stats_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO lead_transition_stats AS s (old_status, new_status, transitions, total_seconds)
+            SELECT n.old_status, n.new_status, count(*),
+                   sum(extract(epoch FROM n.changed_at - coalesce(prev.changed_at, l.created_at)))
+            FROM new_rows n
+            JOIN leads l ON l.id = n.lead_id
+            LEFT JOIN LATERAL (
+                SELECT h.changed_at FROM lead_history h
+                WHERE h.lead_id = n.lead_id
+                  AND (h.changed_at, h.id) < (n.changed_at, n.id)
+                ORDER BY h.changed_at DESC, h.id DESC
+                LIMIT 1
+            ) prev ON TRUE
+            WHERE n.old_status IS NOT NULL AND n.new_status IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (old_status, new_status) DO UPDATE
+                SET transitions = s.transitions + EXCLUDED.transitions,
+                    total_seconds = s.total_seconds + EXCLUDED.total_seconds;
+            RETURN NULL;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS lead_history_transition_stats ON lead_history;
+        CREATE TRIGGER lead_history_transition_stats AFTER INSERT ON lead_history
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION lead_transition_stats_apply();
+
+        -- no writes may slip between the backfill and the triggers taking over
+        LOCK TABLE leads, lead_history IN SHARE ROW EXCLUSIVE MODE;
+    """ + ROLLUP_BACKFILL_SQL),
+    (6, "leads archive and monthly lead_history partitions", r"""
+        -- Closed leads moved out of the hot table by archive.py. Same columns
+        -- as leads (search ones included) so a query can read either or both;
+        -- ids come from leads, so they stay unique across the two.
+        CREATE TABLE IF NOT EXISTS leads_archive (
+            id                BIGINT PRIMARY KEY,
+            name              TEXT NOT NULL,
+            contact_number    TEXT NOT NULL,
+            address           TEXT,
+            source            TEXT,
+            status            TEXT NOT NULL,
+            first_contacted   DATE,
+            notes             TEXT,
+            licence           TEXT,
+            scheduled_walk_in DATE,
+            created_at        TIMESTAMPTZ NOT NULL,
+            updated_at        TIMESTAMPTZ NOT NULL,
+            archived_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            contact_digits    TEXT
+                GENERATED ALWAYS AS (right(regexp_replace(contact_number, '\D', '', 'g'), 10)) STORED,
+            search_vector     tsvector
+                GENERATED ALWAYS AS (
+                    to_tsvector('simple',
+                        coalesce(name, '') || ' ' || coalesce(address, '') || ' ' || coalesce(notes, ''))
+                ) STORED
+        );
+        CREATE INDEX IF NOT EXISTS leads_archive_status_id_idx ON leads_archive (status, id);
+        CREATE INDEX IF NOT EXISTS leads_archive_contact_digits_idx
+            ON leads_archive (contact_digits text_pattern_ops);
+        CREATE INDEX IF NOT EXISTS leads_archive_archived_at_idx ON leads_archive (archived_at);
+        -- archive.py's batch scan: closed leads oldest-touched first
+        CREATE INDEX IF NOT EXISTS leads_status_updated_at_idx ON leads (status, updated_at);
+
+        -- lead_daily_counts keeps counting live leads only (facets read it);
+        -- archived ones are counted here and the dashboard adds the two
+        CREATE TABLE IF NOT EXISTS archive_daily_counts (
+            day        DATE NOT NULL,
+            status     TEXT NOT NULL,
+            source     TEXT NOT NULL,
+            lead_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status, source)
+        );
+
+        CREATE OR REPLACE FUNCTION archive_daily_counts_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO archive_daily_counts AS c (day, status, source, lead_count)
+                SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), count(*)
+                FROM new_rows GROUP BY 1, 2, 3
+                ON CONFLICT (day, status, source) DO UPDATE SET lead_count = c.lead_count + EXCLUDED.lead_count;
+            ELSE
+                INSERT INTO archive_daily_counts AS c (day, status, source, lead_count)
+                SELECT (created_at AT TIME ZONE 'UTC')::date, coalesce(status, ''), coalesce(source, ''), -count(*)
+                FROM old_rows GROUP BY 1, 2, 3
+                ON CONFLICT (day, status, source) DO UPDATE SET lead_count = c.lead_count + EXCLUDED.lead_count;
+            END IF;
+            RETURN NULL;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS leads_archive_daily_counts_insert ON leads_archive;
+        CREATE TRIGGER leads_archive_daily_counts_insert AFTER INSERT ON leads_archive
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION archive_daily_counts_apply();
+        DROP TRIGGER IF EXISTS leads_archive_daily_counts_delete ON leads_archive;
+        CREATE TRIGGER leads_archive_daily_counts_delete AFTER DELETE ON leads_archive
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION archive_daily_counts_apply();
+
+        -- History outlives the move to the archive, so it can't reference
+        -- leads any more; ON DELETE CASCADE becomes a trigger that drops a
+        -- lead's history once the lead is in neither table. It runs at the
+        -- end of the statement, after archive.py's INSERT ... SELECT from
+        -- its DELETE ... RETURNING has filled leads_archive.
+        CREATE OR REPLACE FUNCTION lead_history_drop_orphans() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            DELETE FROM lead_history h
+            USING old_rows o
+            WHERE h.lead_id = o.id
+              AND NOT EXISTS (SELECT 1 FROM leads l WHERE l.id = o.id)
+              AND NOT EXISTS (SELECT 1 FROM leads_archive a WHERE a.id = o.id);
+            RETURN NULL;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS leads_drop_history ON leads;
+        CREATE TRIGGER leads_drop_history AFTER DELETE ON leads
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION lead_history_drop_orphans();
+        DROP TRIGGER IF EXISTS leads_archive_drop_history ON leads_archive;
+        CREATE TRIGGER leads_archive_drop_history AFTER DELETE ON leads_archive
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION lead_history_drop_orphans();
+
+        -- Monthly partitions lead_history_YYYY_MM (UTC months) from first_month
+        -- through last_month, skipping ones that exist. Rows already sitting in
+        -- the default partition for a new month are moved into it first, so
+        -- attaching never fails; returns how many partitions were added.
+        CREATE OR REPLACE FUNCTION lead_history_add_partitions(first_month DATE, last_month DATE)
+        RETURNS INTEGER
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', first_month)::date;
+            lower_bound TIMESTAMPTZ;
+            upper_bound TIMESTAMPTZ;
+            part TEXT;
+            added INTEGER := 0;
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                part := 'lead_history_' || to_char(month_start, 'YYYY_MM');
+                IF to_regclass(part) IS NULL THEN
+                    lower_bound := month_start::timestamp AT TIME ZONE 'UTC';
+                    upper_bound := (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC';
+                    EXECUTE format('CREATE TABLE %I (LIKE lead_history INCLUDING DEFAULTS)', part);
+                    EXECUTE format(
+                        'WITH moved AS (DELETE FROM lead_history_default '
+                        'WHERE changed_at >= %L AND changed_at < %L RETURNING *) '
+                        'INSERT INTO %I SELECT * FROM moved',
+                        lower_bound, upper_bound, part);
+                    EXECUTE format('ALTER TABLE lead_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                                   part, lower_bound, upper_bound);
+                    added := added + 1;
+                END IF;
+                month_start := (month_start + INTERVAL '1 month')::date;
+            END LOOP;
+            RETURN added;
+        END
+        $$;
+
+        -- Rebuild lead_history as a table partitioned by changed_at (once).
+        -- Rows are copied into the default partition, then spread over the
+        -- monthly ones by lead_history_add_partitions().
+        DO $$
+        DECLARE
+            first_month DATE;
+        BEGIN
+            IF (SELECT relkind FROM pg_class WHERE oid = 'lead_history'::regclass) = 'p' THEN
+                RETURN;
+            END IF;
+            LOCK TABLE leads IN SHARE ROW EXCLUSIVE MODE;
+            LOCK TABLE lead_history IN ACCESS EXCLUSIVE MODE;
+
+            CREATE TABLE lead_history_partitioned (
+                id         BIGINT NOT NULL DEFAULT nextval('lead_history_id_seq'),
+                lead_id    BIGINT NOT NULL,
+                old_status TEXT,
+                new_status TEXT,
+                changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                notes      TEXT
+            ) PARTITION BY RANGE (changed_at);
+            CREATE TABLE lead_history_default PARTITION OF lead_history_partitioned DEFAULT;
+            INSERT INTO lead_history_partitioned (id, lead_id, old_status, new_status, changed_at, notes)
+            SELECT id, lead_id, old_status, new_status, changed_at, notes FROM lead_history;
+
+            ALTER SEQUENCE lead_history_id_seq OWNED BY NONE;
+            DROP TABLE lead_history;
+            ALTER TABLE lead_history_partitioned RENAME TO lead_history;
+            ALTER SEQUENCE lead_history_id_seq OWNED BY lead_history.id;
+            -- a partitioned table's primary key must include the partition key
+            ALTER TABLE lead_history ADD PRIMARY KEY (id, changed_at);
+            CREATE INDEX lead_history_lead_id_idx ON lead_history (lead_id, changed_at);
+            CREATE INDEX lead_history_changed_at_idx ON lead_history (changed_at);
+
+            CREATE TRIGGER lead_history_transition_stats AFTER INSERT ON lead_history
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION lead_transition_stats_apply();
+
+            SELECT (min(changed_at) AT TIME ZONE 'UTC')::date INTO first_month FROM lead_history;
+            PERFORM lead_history_add_partitions(
+                least(coalesce(first_month, CURRENT_DATE), CURRENT_DATE),
+                (CURRENT_DATE + INTERVAL '3 months')::date
+            );
+        END
+        $$;
+    """),
+    (7, "background jobs", """
+        -- jobs.py's queue; JSON is kept as TEXT so SQLite shares the queries
+        CREATE TABLE IF NOT EXISTS jobs (
+            id               BIGSERIAL PRIMARY KEY,
+            kind             TEXT NOT NULL,
+            status           TEXT NOT NULL DEFAULT 'queued',
+            params           TEXT NOT NULL,
+            -- handler state saved after every chunk; a resumed run starts from it
+            checkpoint       TEXT,
+            result           TEXT,
+            error            TEXT,
+            done             BIGINT NOT NULL DEFAULT 0,
+            total            BIGINT,
+            cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+            worker           TEXT,
+            attempts         INTEGER NOT NULL DEFAULT 0,
+            created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            started_at       TIMESTAMPTZ,
+            heartbeat_at     TIMESTAMPTZ,
+            finished_at      TIMESTAMPTZ
+        );
+        -- claiming the next queued job, and the UI's recent jobs of a kind
+        CREATE INDEX IF NOT EXISTS jobs_status_id_idx ON jobs (status, id);
+        CREATE INDEX IF NOT EXISTS jobs_kind_id_idx ON jobs (kind, id);
+    """),
+]
+
+
+def _ensure_migrations_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def applied_versions():
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            _ensure_migrations_table(cur)
+            cur.execute("SELECT version FROM schema_migrations")
+            return {row[0] for row in cur.fetchall()}
+
+
+def migrate(connect=None):
+    """Apply every pending migration in order; returns the versions applied.
+
+    ``connect`` defaults to db.get_connection; PostgresBackend.init_schema()
+    passes its own while db.py is still being imported.
+    """
+    connect = connect or db.get_connection
+    applied = []
+    for version, name, sql in MIGRATIONS:
+        with connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK_KEY,))
+                _ensure_migrations_table(cur)
+                cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cur.fetchone():
+                    continue
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name),
+                )
+        applied.append(version)
+    return applied
+
+
+def rebuild_rollups():
+    """Recompute lead_daily_counts, archive_daily_counts and lead_transition_stats from the base tables.
+
+    The triggers keep both current; this is for repairing drift (e.g. after
+    a TRUNCATE, which fires no row triggers) or dropping deleted leads'
+    history from the transition stats.
+    """
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE leads, leads_archive, lead_history IN SHARE ROW EXCLUSIVE MODE")
+            cur.execute(ROLLUP_REBUILD_SQL)
+
+
+# --- Index usage check ---
+# (label, query, params) for the app's main access paths
+PLAN_CHECKS = [
+    ("lead_exists by contact", "SELECT 1 FROM leads WHERE contact_number = %s LIMIT 1", ("9000000000",)),
+    ("newest page", "SELECT * FROM leads ORDER BY id DESC LIMIT 50", ()),
+    ("status filter page", "SELECT * FROM leads WHERE status = %s ORDER BY id DESC LIMIT 50", ("pending",)),
+    ("source filter page", "SELECT * FROM leads WHERE source = %s ORDER BY id DESC LIMIT 50", ("Referral",)),
+    ("licence filter page", "SELECT * FROM leads WHERE licence = %s ORDER BY id DESC LIMIT 50", ("yes",)),
+    ("first_contacted range",
+     "SELECT * FROM leads WHERE first_contacted >= %s AND first_contacted < %s", ("2025-01-01", "2025-01-02")),
+    ("scheduled_walk_in day",
+     "SELECT * FROM leads WHERE scheduled_walk_in >= %s AND scheduled_walk_in < %s", ("2025-01-01", "2025-01-02")),
+    ("history for a lead", "SELECT * FROM lead_history WHERE lead_id = %s ORDER BY changed_at", (1,)),
+    ("archive batch scan",
+     "SELECT id FROM leads WHERE status = %s AND updated_at < %s LIMIT 1000", ("rejected", "2025-01-01")),
+    ("full-text search",
+     "SELECT id FROM leads WHERE search_vector @@ websearch_to_tsquery('simple', %s)", ("ravi",)),
+    ("contact digits prefix", "SELECT id FROM leads WHERE contact_digits LIKE %s", ("98765%",)),
+]
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def check_query_plans():
+    """EXPLAIN each main query and report whether it can be served by an index.
+
+    Sequential scans are disabled for the check, so a query whose plan still
+    contains a Seq Scan has no usable index; on small tables the planner
+    would otherwise (rightly) prefer a scan and hide a missing index.
+    """
+    report = []
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            for label, query, params in PLAN_CHECKS:
+                cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = [node["Node Type"] for node in _plan_nodes(plan[0]["Plan"])]
+                report.append({
+                    "query": label,
+                    "uses_index": "Seq Scan" not in nodes,
+                    "nodes": nodes,
+                })
+        conn.rollback()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lead Tracker schema migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--check", action="store_true", help="verify the main queries can use indexes")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="recompute the analytics rollups")
+    args = parser.parse_args()
+
+    if args.status:
+        applied = applied_versions()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in applied else 'pending':<8} {name}")
+        return 0
+
+    if args.check:
+        ok = True
+        for row in check_query_plans():
+            ok &= row["uses_index"]
+            print(f"{'OK ' if row['uses_index'] else 'SEQ'}  {row['query']:<24} {' > '.join(row['nodes'])}")
+        return 0 if ok else 1
+
+    if args.rebuild_rollups:
+        rebuild_rollups()
+        print("Analytics rollups rebuilt.")
+        return 0
+
+    applied = migrate()
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from validation import validate_leads
+
+
+def _upload(first_contacted):
+    return pd.DataFrame({
+        "name": "Lead",
+        "contact_number": [f"07{i:09d}" for i in range(len(first_contacted))],
+        "source": "Referral",
+        "status": "pending",
+        "licence": "yes",
+        "first_contacted": first_contacted,
+    })
+
+
+def test_mixed_date_formats_are_parsed_row_by_row():
+    df = validate_leads(_upload(["2024-01-05", "05/01/2024", "Jan 6 2024", None]))
+    assert df["is_valid"].tolist() == [True, True, True, True]
+
+
+def test_unparseable_date_is_flagged():
+    df = validate_leads(_upload(["2024-01-05", "not a date"]))
+    assert df["is_valid"].tolist() == [True, False]
+    assert "Invalid first_contacted date" in df.loc[1, "errors"]
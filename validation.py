@@ -0,0 +1,133 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- Allowed values, shared by the Add Lead form, Manage Leads and uploads ---
+LEAD_STATUSES = ["pending", "processing", "onboarded", "rejected"]
+LEAD_SOURCES = ["Instagram", "Referral", "Walk-in", "Other"]
+LICENCE_OPTIONS = ["unknown", "yes", "no"]
+
+# --- Contact numbers ---
+# Canonical form is the last NATIONAL_DIGITS digits, so "+91 98765 43210",
+# "098765-43210" and "9876543210" compare equal. The leads.contact_digits
+# column (migration 4) computes the same thing in SQL.
+COUNTRY_CODE = "91"
+NATIONAL_DIGITS = 10
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_contact(value):
+    """Canonical digits of a phone number; "" when it has none."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel: 9876543210.0
+    return _NON_DIGITS.sub("", str(value))[-NATIONAL_DIGITS:]
+
+
+def normalize_contacts(values):
+    """normalize_contact() over a whole Series at once."""
+    text = values.astype("string").str.strip()
+    # floats from Excel/CSV come through as "9876543210.0"
+    text = text.str.replace(r"\.0+$", "", regex=True)
+    return text.str.replace(r"\D", "", regex=True).str[-NATIONAL_DIGITS:].fillna("").astype(object)
+
+
+def contact_search_digits(term):
+    """Digits to look for in canonical numbers for a (possibly partial) search.
+
+    An international prefix ("+91 98", "0091 98") is dropped so partial
+    numbers typed with a country code still match.
+    """
+    term = str(term).strip()
+    digits = _NON_DIGITS.sub("", term)
+    if term.startswith("+") or term.startswith("00"):
+        digits = digits.lstrip("0")
+        if digits.startswith(COUNTRY_CODE):
+            digits = digits[len(COUNTRY_CODE):]
+    return digits[-NATIONAL_DIGITS:]
+
+
+# --- Declarative rule set ---
+# Each rule names its check, the column(s) it reads and the message written
+# to the "errors" column when it fails.
+#   required -> every listed column must be present and non-blank
+#   one_of   -> value must be one of "values" (missing counts as invalid)
+#   date     -> value may be blank, otherwise it must parse as a date
+LEAD_RULES = [
+    {"check": "required", "columns": ["name", "contact_number"], "message": "Missing name/contact"},
+    {"check": "one_of", "column": "status", "values": LEAD_STATUSES, "message": "Invalid status"},
+    {"check": "one_of", "column": "source", "values": LEAD_SOURCES, "message": "Invalid source"},
+    {"check": "one_of", "column": "licence", "values": LICENCE_OPTIONS,
+     "message": "Invalid licence (must be Unknown/yes/no)"},
+    {"check": "date", "column": "first_contacted", "message": "Invalid first_contacted date"},
+    {"check": "date", "column": "scheduled_walk_in", "message": "Invalid scheduled_walk_in date"},
+]
+
+
+def _blank(df, column):
+    if column not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    values = df[column]
+    blank = values.isna()
+    if pd.api.types.is_string_dtype(values.dtype):
+        blank |= values.astype(str).str.strip().eq("")
+    return blank.to_numpy()
+
+
+def _required(df, rule):
+    failed = np.zeros(len(df), dtype=bool)
+    for column in rule["columns"]:
+        failed |= _blank(df, column)
+    return failed
+
+
+def _one_of(df, rule):
+    if rule["column"] not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    return ~df[rule["column"]].isin(rule["values"]).to_numpy()
+
+
+def _date(df, rule):
+    column = rule["column"]
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    # each value parsed on its own: uploads mix "2024-01-05", "05/01/2024", "Jan 6 2024"
+    parsed = pd.to_datetime(df[column], errors="coerce", format="mixed")
+    return parsed.isna().to_numpy() & ~_blank(df, column)
+
+
+_CHECKS = {"required": _required, "one_of": _one_of, "date": _date}
+
+
+def failure_masks(df, rules=LEAD_RULES):
+    """Return an (n_rows, n_rules) boolean array, True where a rule fails."""
+    masks = np.zeros((len(df), len(rules)), dtype=bool)
+    for i, rule in enumerate(rules):
+        masks[:, i] = _CHECKS[rule["check"]](df, rule)
+    return masks
+
+
+def validate_leads(df, rules=LEAD_RULES):
+    """Validate a lead DataFrame column-wise.
+
+    Adds "is_valid" and "errors" columns in place and returns the frame.
+    Each row's failing rules are encoded as a bit pattern, so building the
+    messages costs one dict lookup per distinct combination, not per row.
+    """
+    masks = failure_masks(df, rules)
+    codes = masks @ (1 << np.arange(len(rules), dtype=np.int64))
+    messages = {
+        code: ", ".join(rule["message"] for i, rule in enumerate(rules) if code >> i & 1)
+        for code in np.unique(codes).tolist()
+    }
+    df["is_valid"] = codes == 0
+    df["errors"] = pd.Series(codes, index=df.index).map(messages)
+    return df
+
+
+def validate_lead(record, rules=LEAD_RULES):
+    """Validate a single lead (e.g. the Add Lead form); returns error messages."""
+    masks = failure_masks(pd.DataFrame([record]), rules)
+    return [rule["message"] for rule, failed in zip(rules, masks[0]) if failed]